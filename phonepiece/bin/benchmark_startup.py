@@ -0,0 +1,88 @@
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+
+# executed in a fresh interpreter, so that nothing is imported or cached in advance
+_startup_script = """
+import sys, time, json
+start = time.perf_counter()
+from phonepiece.inventory import read_inventory
+imported = time.perf_counter()
+inv = read_inventory(sys.argv[1], sys.argv[2])
+loaded = time.perf_counter()
+print(json.dumps({'import': imported - start, 'inventory': loaded - imported}))
+"""
+
+
+def measure_startup(lang_id='eng', model_name='latest'):
+    """
+    measure startup cost in a fresh interpreter
+
+    :param lang_id: language used for the first read_inventory call
+    :param model_name: model name or a customized path
+    :return: dict of seconds spent on importing phonepiece.inventory and on the first read_inventory
+    """
+
+    output = subprocess.run([sys.executable, '-c', _startup_script, lang_id, model_name],
+                            check=True, capture_output=True, text=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def benchmark_startup(lang_id='eng', model_name='latest', repeat=5):
+    """
+    repeat measure_startup and report the median of each stage in milliseconds
+
+    :param lang_id: language used for the first read_inventory call
+    :param model_name: model name or a customized path
+    :param repeat: number of fresh interpreters
+    :return: dict of median milliseconds
+    """
+
+    records = [measure_startup(lang_id, model_name) for _ in range(repeat)]
+
+    result = {}
+    for stage in ['import', 'inventory']:
+        times = sorted(record[stage] for record in records)
+        result[stage] = times[len(times) // 2] * 1000
+
+    return result
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser('measure import time and time to the first read_inventory')
+    parser.add_argument('-l', '--lang', default='eng', help='language of the first read_inventory call')
+    parser.add_argument('-m', '--model', default='latest', help='model name or a customized path')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of fresh interpreters')
+    parser.add_argument('--import_budget', type=float, default=None, help='fail if importing takes more milliseconds')
+    parser.add_argument('--inventory_budget', type=float, default=None, help='fail if the first read_inventory takes more milliseconds')
+    parser.add_argument('-o', '--output', default=None, help='append the result as a json line to this file')
+
+    args = parser.parse_args()
+
+    result = benchmark_startup(args.lang, args.model, args.repeat)
+
+    print(f"import    : {result['import']:.1f} ms")
+    print(f"inventory : {result['inventory']:.1f} ms")
+
+    if args.output is not None:
+        record = dict(result, lang=args.lang, model=args.model, time=time.strftime('%Y-%m-%d %H:%M:%S'))
+        with open(args.output, 'a', encoding='utf-8') as w:
+            w.write(json.dumps(record) + '\n')
+
+    over_budget = False
+
+    if args.import_budget is not None and result['import'] > args.import_budget:
+        print(f"import exceeds the budget of {args.import_budget:.1f} ms")
+        over_budget = True
+
+    if args.inventory_budget is not None and result['inventory'] > args.inventory_budget:
+        print(f"read_inventory exceeds the budget of {args.inventory_budget:.1f} ms")
+        over_budget = True
+
+    if over_budget:
+        sys.exit(1)
@@ -32,6 +32,19 @@ def download_model(model_name=None, alt_model_path=None):
             print("Error: could not download the model", e)
             (model_dir / model_name).rmdir()
 
+        # pack all inventories of the model into a single bundle
+        if not alt_model_path and (model_dir / model_name).exists():
+            pack_model(model_name)
+
+
+def pack_model(model_name):
+    # the bundle only speeds up loading, inventories are still read from their files without it
+    try:
+        from phonepiece.bundle import write_inventory_bundle
+        write_inventory_bundle(model_name)
+    except Exception as e:
+        print("Warning: could not pack the inventories of the model", e)
+
 
 if __name__ == '__main__':
 
@@ -1,29 +1,262 @@
+import io
 import sys
+import sqlite3
+import itertools
+import tempfile
+import multiprocessing
+from collections import deque
 from pathlib import Path
 from phonepiece.distance import phonological_distance, fast_edit_distance, edit_distance
+from phonepiece.ipa import share_ipa, unshare_ipa
 import argparse
 from tqdm import tqdm
 from collections import Counter
 
 
-def eval_distance(hyp, ref, output=None, file_format='kaldi', verbose=True, return_counter=False):
+def score_utterance(utt_id, ref, hyp, verbose=True):
+    """
+    score one utterance
+
+    :param utt_id: utterance id
+    :param ref: list of reference phones
+    :param hyp: list of hypothesis phones
+    :param verbose: compute the alignment and its add/del/sub lists
+    :return: (err, dst, len, add_cnt, del_cnt, sub_cnt, add_lst, del_lst, sub_lst, alignment printout)
+    """
+
+    dst_cnt = phonological_distance(ref, hyp)
+    all_cnt = len(ref)
+
+    if verbose:
+        out = io.StringIO()
+        err_cnt, add_cnt, del_cnt, sub_cnt, add_lst, del_lst, sub_lst = edit_distance(ref, hyp, utt_id=utt_id, verbose=verbose, out=out)
+        return err_cnt, dst_cnt, all_cnt, add_cnt, del_cnt, sub_cnt, add_lst, del_lst, sub_lst, out.getvalue()
+
+    err_cnt = fast_edit_distance(ref, hyp)
+    return err_cnt, dst_cnt, all_cnt, 0, 0, 0, [], [], [], ''
+
+
+def score_chunk(chunk, verbose=True):
+    return [score_utterance(utt_id, ref, hyp, verbose) for utt_id, ref, hyp in chunk]
+
+
+def score_utterances(utterances, verbose=True, jobs=1, chunk_size=256, timeout=None):
+    """
+    score utterances in input order, in this process or across a pool of jobs processes.
+    chunks are submitted with apply_async and collected in submission order.
+    a worker killed by the os (e.g. out of memory) loses its chunk without error, waiting for it blocks forever
+    unless timeout is set
+
+    :param utterances: iterable of (utt_id, ref, hyp), consumed lazily
+    :param verbose: see score_utterance
+    :param jobs: number of processes
+    :param chunk_size: number of utterances sent to a process at once
+    :param timeout: seconds to wait for the result of a chunk, multiprocessing.TimeoutError is raised after it. None waits forever
+    :return: iterator of score_utterance results, in the order of utterances
+    """
+
+    if jobs <= 1:
+        for utt_id, ref, hyp in utterances:
+            yield score_utterance(utt_id, ref, hyp, verbose)
+        return
+
+    utterances = iter(utterances)
+    chunks = iter(lambda: list(itertools.islice(utterances, chunk_size)), [])
+
+    # workers memory-map the ipa database of this process instead of loading their own copy
+    share_ipa()
+
+    try:
+        with multiprocessing.Pool(jobs) as pool:
+
+            # at most 2 chunks per process are in flight, so that inputs are read as they are scored.
+            # chunks are collected in the submission order, so the merge is deterministic
+            pending = deque()
+
+            for chunk in chunks:
+                pending.append(pool.apply_async(score_chunk, (chunk, verbose)))
+
+                if len(pending) >= jobs * 2:
+                    yield from pending.popleft().get(timeout)
+
+            while pending:
+                yield from pending.popleft().get(timeout)
+    finally:
+        unshare_ipa()
+
+
+def read_utterances(path, file_format='kaldi'):
+    """
+    stream the utterances of a kaldi text file (utt_id followed by phones) or a plain text file (phones only)
+
+    :param path: path to the file
+    :param file_format: kaldi or text, utterances of text files are identified by their line number
+    :return: iterator of (utt_id, list of phones)
+    """
+
+    with open(path, 'r') as f:
+        for i, line in enumerate(f):
+            fields = line.strip().split()
+
+            if file_format == 'kaldi':
+                yield fields[0], fields[1:]
+            else:
+                yield f"{i:05d}", fields
+
+
+def join_sorted(hyp, ref):
+    """
+    merge-join hypotheses and references of two kaldi files sorted by utt_id (e.g. with LC_ALL=C sort)
+
+    :param hyp: path to the hypothesis file
+    :param ref: path to the reference file
+    :return: iterator of (utt_id, ref, hyp) in hypothesis order, hypotheses without reference are skipped
+             and the last entry of a duplicated reference utt_id wins, as in the other joins
+    """
+
+    def sorted_refs():
+        prev_ref_id = None
+        for ref_id, ref_phones in read_utterances(ref):
+            assert prev_ref_id is None or prev_ref_id <= ref_id, f"{ref} is not sorted by utt_id: {ref_id} after {prev_ref_id}"
+            prev_ref_id = ref_id
+            yield ref_id, ref_phones
+
+    refs = sorted_refs()
+    cur_ref = next(refs, None)
+    next_ref = next(refs, None)
+
+    prev_utt_id = None
+
+    for utt_id, hyp_phones in read_utterances(hyp):
+
+        assert prev_utt_id is None or prev_utt_id <= utt_id, f"{hyp} is not sorted by utt_id: {utt_id} after {prev_utt_id}"
+        prev_utt_id = utt_id
+
+        # skip smaller references and all but the last reference of a duplicated utt_id
+        while cur_ref is not None and (cur_ref[0] < utt_id or (next_ref is not None and next_ref[0] == cur_ref[0])):
+            cur_ref, next_ref = next_ref, next(refs, None)
+
+        if cur_ref is not None and cur_ref[0] == utt_id:
+            yield utt_id, cur_ref[1], hyp_phones
+
+
+def build_ref_index(ref, index_path):
+    """
+    index the byte offset of every utterance of a kaldi reference file into an sqlite database
+
+    :param ref: path to the reference file
+    :param index_path: path to the index
+    """
+
+    with sqlite3.connect(str(index_path)) as db:
+        db.execute("DROP TABLE IF EXISTS utt")
+        db.execute("CREATE TABLE utt (utt_id TEXT PRIMARY KEY, offset INTEGER)")
+
+        def offsets():
+            with open(ref, 'rb') as f:
+                offset = 0
+                for line in f:
+                    fields = line.split(maxsplit=1)
+                    if fields:
+                        yield fields[0].decode('utf-8'), offset
+                    offset += len(line)
+
+        # the last entry of a duplicated utt_id wins, as in memory mode
+        db.executemany("INSERT OR REPLACE INTO utt VALUES (?, ?)", offsets())
+
+    db.close()
+
+
+def join_indexed(hyp, ref, index_path=None):
+    """
+    join hypotheses with references of two unsorted kaldi files through an on-disk index of the references
+
+    :param hyp: path to the hypothesis file
+    :param ref: path to the reference file
+    :param index_path: path to the index, a temporary file by default
+    :return: iterator of (utt_id, ref, hyp) in hypothesis order, hypotheses without reference are skipped
+             and the last entry of a duplicated reference utt_id wins
+    """
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if index_path is None:
+            index_path = Path(tmp_dir) / 'ref.idx'
+
+        build_ref_index(ref, index_path)
+
+        db = sqlite3.connect(str(index_path))
+
+        try:
+            with open(ref, 'rb') as f:
+                for utt_id, hyp_phones in read_utterances(hyp):
+                    row = db.execute("SELECT offset FROM utt WHERE utt_id = ?", (utt_id,)).fetchone()
+
+                    if row is None:
+                        continue
+
+                    f.seek(row[0])
+                    yield utt_id, f.readline().decode('utf-8').strip().split()[1:], hyp_phones
+        finally:
+            db.close()
+
+
+def join_in_memory(hyp, ref, file_format='kaldi'):
+    """
+    join hypotheses with references loaded into memory
+
+    :param hyp: path to the hypothesis file
+    :param ref: path to the reference file
+    :param file_format: kaldi or text
+    :return: iterator of (utt_id, ref, hyp) in hypothesis order, hypotheses without reference are skipped
+             and the last entry of a duplicated reference utt_id wins
+    """
+
+    expect_label = dict(read_utterances(ref, file_format))
+
+    for utt_id, hyp_phones in read_utterances(hyp, file_format):
+        if utt_id in expect_label:
+            yield utt_id, expect_label[utt_id], hyp_phones
+
+
+def join_utterances(hyp, ref, file_format='kaldi', join='memory', index_path=None):
+    """
+    pair every hypothesis with its reference
+
+    :param hyp: path to the hypothesis file
+    :param ref: path to the reference file
+    :param file_format: kaldi or text
+    :param join: memory (load references), sorted (merge-join sorted files) or index (on-disk index of references).
+                 text files are always paired line by line
+    :param index_path: path to the index of the index mode
+    :return: iterator of (utt_id, ref, hyp)
+    """
+
+    assert join in ['memory', 'sorted', 'index']
+
+    if file_format == 'text':
+        for (utt_id, hyp_phones), (_, ref_phones) in zip(read_utterances(hyp, file_format), read_utterances(ref, file_format)):
+            yield utt_id, ref_phones, hyp_phones
+
+    elif join == 'sorted':
+        yield from join_sorted(hyp, ref)
+
+    elif join == 'index':
+        yield from join_indexed(hyp, ref, index_path)
+
+    else:
+        yield from join_in_memory(hyp, ref, file_format)
+
+
+def eval_distance(hyp, ref, output=None, file_format='kaldi', verbose=True, return_counter=False, jobs=1, chunk_size=256,
+                  join='memory', index_path=None, timeout=None):
 
     w = None
     if output is not None:
         Path(output).parent.mkdir(exist_ok=True, parents=True)
         w = open(output, "w")
 
-    expect_label = {}
-
-    for i, line in enumerate(open(ref, 'r')):
-        fields = line.strip().split()
-
-        if file_format == 'kaldi':
-            utt_id = fields[0]
-            expect_label[utt_id] = fields[1:]
-        else:
-            utt_id = f"{i:05d}"
-            expect_label[utt_id] = fields
+    # utterances are read, scored and written as a stream, see join_utterances for the memory used by each join
+    utterances = join_utterances(hyp, ref, file_format, join, index_path)
 
     tot_len_cnt = 0
     tot_err_cnt = 0
@@ -36,26 +269,15 @@ def eval_distance(hyp, ref, output=None, file_format='kaldi', verbose=True, retu
     del_counter = Counter()
     sub_counter = Counter()
 
-    for i, line in enumerate(tqdm(open(hyp, 'r').readlines())):
-        fields = line.strip().split()
-
-        if file_format == 'kaldi':
-            utt_id = fields[0]
-            hyp = fields[1:]
-        else:
-            utt_id = f"{i:05d}"
-            hyp = fields
+    results = score_utterances(utterances, verbose, jobs, chunk_size, timeout)
 
-        if utt_id not in expect_label:
-            continue
-
-        ref = expect_label[utt_id]
-
-        dst_cnt = phonological_distance(ref, hyp)
-        all_cnt = len(expect_label[utt_id])
+    # totals are accumulated in input order, so they do not depend on jobs
+    for result in tqdm(results):
+        err_cnt, dst_cnt, all_cnt, add_cnt, del_cnt, sub_cnt, add_lst, del_lst, sub_lst, alignment = result
 
         if verbose:
-            err_cnt, add_cnt, del_cnt, sub_cnt, add_lst, del_lst, sub_lst = edit_distance(ref, hyp, utt_id=utt_id, verbose=verbose, out=w)
+            (w if w is not None else sys.stdout).write(alignment)
+
             tot_add_cnt += add_cnt
             tot_del_cnt += del_cnt
             tot_sub_cnt += sub_cnt
@@ -63,9 +285,6 @@ def eval_distance(hyp, ref, output=None, file_format='kaldi', verbose=True, retu
             del_counter.update(del_lst)
             sub_counter.update(sub_lst)
 
-        else:
-            err_cnt = fast_edit_distance(ref, hyp)
-
         tot_err_cnt += err_cnt
         tot_dst_cnt += dst_cnt
         tot_len_cnt += all_cnt
@@ -137,6 +356,12 @@ if __name__ == '__main__':
     parser.add_argument('-f', '--format', default='kaldi', help='kaldi or text')
     parser.add_argument('-o', '--output', help='the path to the reference file')
     parser.add_argument('-v', '--verbose', type=bool ,default=True)
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes used to score utterances')
+    parser.add_argument('--chunk-size', type=int, default=256, help='number of utterances sent to a process at once')
+    parser.add_argument('--join', default='memory', choices=['memory', 'sorted', 'index'],
+                        help='memory: load references, sorted: stream kaldi files sorted by utt_id, index: on-disk index of references')
+    parser.add_argument('--index', help='path to the on-disk index of the index join')
+    parser.add_argument('--timeout', type=float, help='seconds to wait for a chunk before giving up, e.g. when a worker was killed')
 
     args = parser.parse_args()
     output = args.output
@@ -147,4 +372,5 @@ if __name__ == '__main__':
 
     assert file_format in ['kaldi', 'text']
 
-    eval_distance(hyp, ref, output, file_format=file_format, verbose=verbose)
\ No newline at end of file
+    eval_distance(hyp, ref, output, file_format=file_format, verbose=verbose, jobs=args.jobs, chunk_size=args.chunk_size,
+                  join=args.join, index_path=args.index, timeout=args.timeout)
\ No newline at end of file
@@ -0,0 +1,13 @@
+from phonepiece.bundle import write_inventory_bundle, read_inventory_bundle
+import argparse
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser('a utility to pack all inventories of a model into a single bundle')
+    parser.add_argument('-m', '--model', default='latest',  help='specify which downloaded model to pack')
+
+    args = parser.parse_args()
+
+    bundle_path = write_inventory_bundle(args.model)
+    print(f"packed {len(read_inventory_bundle(args.model))} inventories into {bundle_path}")
@@ -5,6 +5,7 @@ import io
 import argparse
 import os
 import shutil
+from phonepiece.bin.download_model import pack_model
 
 def update_model(model_name=None, alt_model_path=None):
 
@@ -35,6 +36,10 @@ def update_model(model_name=None, alt_model_path=None):
         print("Error: could not download the model", e)
         (model_dir / model_name).rmdir()
 
+    # pack all inventories of the model into a single bundle
+    if not alt_model_path and (model_dir / model_name).exists():
+        pack_model(model_name)
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,192 @@
+from phonepiece.config import PhonePieceConfig
+from phonepiece.utils import lang_dir_name
+from pathlib import Path
+import mmap
+import json
+import os
+
+
+# version of the inventory bundle, bump it whenever its layout changes
+_bundle_version = 3
+_bundle_magic = b'PPINV\0\0\0'
+_bundle_name = 'inventory.bundle'
+
+# files of each language packed into the bundle
+_bundle_files = ['phone.txt', 'phoneme.txt', 'allophone.txt']
+
+# model name -> InventoryBundle (None if the model has no bundle)
+_bundles = dict()
+
+
+def write_inventory_bundle(model_name='latest'):
+    """
+    pack the inventory files of every language of a model into a single bundle under data/model/<model_name>.
+    the bundle is a magic, the stamp of the model directory, the length of a json index, the index and the packed files.
+    each language is stored as its phone.txt, phoneme.txt and allophone.txt joined by NUL.
+
+    :param model_name: model name
+    :return: path to the bundle
+    """
+
+    model_dir = PhonePieceConfig.data_path / 'model' / model_name
+
+    index = dict()
+    chunks = []
+    offset = 0
+
+    for lang_dir in sorted(model_dir.iterdir()):
+        files = [lang_dir / name for name in _bundle_files]
+
+        if not all(file.exists() for file in files):
+            continue
+
+        data = b'\0'.join(file.read_bytes() for file in files)
+
+        index[lang_dir.name] = [offset, len(data)]
+        chunks.append(data)
+        offset += len(data)
+
+    header = json.dumps({'version': _bundle_version, 'langs': index}).encode('utf-8')
+
+    bundle_path = model_dir / _bundle_name
+    tmp_path = model_dir / f'{_bundle_name}.{os.getpid()}.tmp'
+
+    with open(tmp_path, 'wb') as w:
+        w.write(_bundle_magic)
+        w.write(bytes(8))
+        w.write(len(header).to_bytes(8, 'little'))
+        w.write(header)
+        for chunk in chunks:
+            w.write(chunk)
+
+    os.replace(tmp_path, bundle_path)
+
+    # adding the bundle changes the mtime of the model directory, so the stamp is written in place afterwards
+    with open(bundle_path, 'r+b') as w:
+        w.seek(len(_bundle_magic))
+        w.write(model_stamp(model_dir).to_bytes(8, 'little'))
+
+    # reopen the new bundle on the next lookup
+    _bundles.pop(model_name, None)
+
+    return bundle_path
+
+
+def read_inventory_bundle(model_name='latest'):
+    """
+    memory-map the inventory bundle of a model, bundles are opened once per process.
+    the bundle is built on first use, and built again when languages have been added to or removed
+    from the model directory since packing (its mtime is the only file checked).
+    files edited in place are not detected, run phonepiece.bin.pack_model after editing a prebuilt model
+
+    :param model_name: model name
+    :return: InventoryBundle or None if the model does not exist or its bundle cannot be written
+    """
+
+    if model_name in _bundles:
+        return _bundles[model_name]
+
+    model_dir = PhonePieceConfig.data_path / 'model' / model_name
+    bundle_path = model_dir / _bundle_name
+    bundle = None
+
+    if model_dir.is_dir():
+        if bundle_path.exists():
+            try:
+                bundle = InventoryBundle(bundle_path)
+            except (OSError, ValueError) as e:
+                PhonePieceConfig.logger.warning(f"could not read inventory bundle {bundle_path}: {e}")
+
+        if bundle is None or bundle.model_stamp != model_stamp(model_dir):
+            try:
+                bundle = InventoryBundle(write_inventory_bundle(model_name))
+            except (OSError, ValueError) as e:
+                PhonePieceConfig.logger.warning(f"could not write inventory bundle {bundle_path}: {e}")
+                bundle = None
+
+    _bundles[model_name] = bundle
+    return bundle
+
+
+def model_stamp(model_dir):
+    # mtime of the model directory, it changes when a language directory is added or removed
+    return model_dir.stat().st_mtime_ns
+
+
+def read_bundle_sources(lang_id, model_name='latest'):
+    """
+    read the inventory files of a language from the bundle of its model, see read_inventory_bundle.
+    languages whose files have been removed are still read from the bundle
+
+    :param lang_id: normalized 3 char iso id
+    :param model_name: model name or a customized path
+    :return: (lines of phone.txt, lines of phoneme.txt, lines of allophone.txt, lang_dir),
+             None if the language is not bundled
+    """
+
+    dir_name = lang_dir_name(lang_id)
+
+    # customized paths are read from their files
+    if (Path(model_name) / dir_name).exists():
+        return None
+
+    bundle = read_inventory_bundle(model_name)
+
+    if bundle is None or dir_name not in bundle:
+        return None
+
+    lang_dir = PhonePieceConfig.data_path / 'model' / model_name / dir_name
+
+    phone_lines, phoneme_lines, allophone_lines = bundle.read_sources(dir_name)
+
+    return phone_lines, phoneme_lines, allophone_lines, lang_dir
+
+
+class InventoryBundle:
+
+    def __init__(self, bundle_path):
+        """
+        memory-mapped inventory bundle created by write_inventory_bundle
+
+        :param bundle_path: path to the bundle
+        """
+
+        self.bundle_path = bundle_path
+
+        with open(bundle_path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[:8] != _bundle_magic:
+            raise ValueError(f"{bundle_path} is not an inventory bundle")
+
+        # mtime of the model directory when the bundle was written
+        self.model_stamp = int.from_bytes(self.buffer[8:16], 'little')
+
+        header_len = int.from_bytes(self.buffer[16:24], 'little')
+        header = json.loads(self.buffer[24:24+header_len].decode('utf-8'))
+
+        if header['version'] != _bundle_version:
+            raise ValueError(f"{bundle_path} has version {header['version']}, expected {_bundle_version}")
+
+        self.data_offset = 24 + header_len
+        self.langs = header['langs']
+
+    def __contains__(self, lang):
+        return lang in self.langs
+
+    def __len__(self):
+        return len(self.langs)
+
+    def read_sources(self, lang):
+        """
+        decode the inventory files of a language
+
+        :param lang: name of the language directory
+        :return: lines of phone.txt, phoneme.txt and allophone.txt
+        """
+
+        offset, length = self.langs[lang]
+        start = self.data_offset + offset
+
+        data = self.buffer[start:start+length].decode('utf-8')
+        return [text.splitlines() for text in data.split('\0')]
@@ -0,0 +1,191 @@
+from phonepiece.config import PhonePieceConfig
+import threading
+import time
+from collections import OrderedDict
+
+
+# number of locks guarding cache misses, keys are assigned to locks by their hash
+_num_stripes = 32
+
+
+class CacheStats:
+
+    def __init__(self, name):
+        """
+        counters of a cache: hits, misses, misses on unknown symbols and the time spent computing misses.
+        counters are updated without lock, so they are approximate under heavy concurrent use.
+
+        if PhonePieceConfig.stats_log_interval is set, a summary is logged at most once per interval (checked on misses)
+
+        :param name: name used in the log line
+        """
+
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.unknown = 0
+        self.miss_time = 0.0
+        self.last_log = time.monotonic()
+
+    def record_miss(self, seconds, unknown=False):
+
+        self.misses += 1
+        self.miss_time += seconds
+
+        if unknown:
+            self.unknown += 1
+
+        interval = PhonePieceConfig.stats_log_interval
+
+        if interval is not None and time.monotonic() - self.last_log >= interval:
+            self.last_log = time.monotonic()
+            PhonePieceConfig.logger.info(str(self))
+
+    def to_dict(self):
+        total = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'unknown': self.unknown,
+            'hit_rate': self.hits / total if total > 0 else 0.0,
+            'miss_time': self.miss_time,
+        }
+
+    def __str__(self):
+        stats = self.to_dict()
+        return (f"{self.name}: {stats['hits']} hits, {stats['misses']} misses ({stats['unknown']} unknown), "
+                f"hit rate {stats['hit_rate']:.3f}, {stats['miss_time']*1000:.1f} ms on misses")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class BoundedCache:
+
+    def __init__(self, max_size, name='cache', lru=False):
+        """
+        bounded memo shared by many threads.
+
+        hits are plain dict reads and never block. misses take the lock of the key's stripe,
+        so a missing key is computed once while other keys are computed in parallel.
+        once the cache is full, the oldest entries are dropped, or the least recently used ones if lru is set
+
+        :param max_size: max number of entries, or a function returning it (e.g. to follow PhonePieceConfig)
+        :param name: name of the cache in its statistics
+        :param lru: move entries to the end on hits, at the cost of an OrderedDict update per hit
+        """
+
+        self.max_size = max_size
+        self.lru = lru
+        self.mapping = OrderedDict() if lru else dict()
+        self.locks = [threading.Lock() for _ in range(_num_stripes)]
+        self.stats = CacheStats(name)
+
+    def __getstate__(self):
+        # locks cannot be pickled, they are created again in __setstate__
+        state = self.__dict__.copy()
+        del state['locks']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.locks = [threading.Lock() for _ in range(_num_stripes)]
+
+    def __contains__(self, key):
+        return key in self.mapping
+
+    def __getitem__(self, key):
+        return self.mapping[key]
+
+    def __len__(self):
+        return len(self.mapping)
+
+    def __iter__(self):
+        return iter(list(self.mapping))
+
+    def get(self, key, default=None):
+        return self.mapping.get(key, default)
+
+    def pop(self, key, default=None):
+        return self.mapping.pop(key, default)
+
+    def clear(self):
+        self.mapping.clear()
+
+    def get_or_compute(self, key, compute, is_unknown=None, is_valid=None):
+        """
+        look up key, compute and store it on a miss
+
+        :param key: a hashable key
+        :param compute: function computing the value of key, values must not be None
+        :param is_unknown: function telling whether a missing key is an unknown symbol, only used for statistics
+        :param is_valid: function telling whether a stored value is still up to date, outdated values are computed again
+        :return: value of key
+        """
+
+        value = self.lookup(key, is_valid)
+        if value is not None:
+            return value
+
+        with self.locks[hash(key) % _num_stripes]:
+
+            # another thread may have computed it while we were waiting
+            value = self.lookup(key, is_valid)
+            if value is not None:
+                return value
+
+            start = time.perf_counter()
+            value = compute(key)
+            self.put(key, value)
+
+            self.stats.record_miss(time.perf_counter() - start, is_unknown is not None and is_unknown(key))
+
+        return value
+
+    def lookup(self, key, is_valid=None):
+
+        value = self.mapping.get(key)
+
+        if value is not None and (is_valid is None or is_valid(value)):
+            self.stats.hits += 1
+
+            if self.lru:
+                try:
+                    self.mapping.move_to_end(key)
+                except KeyError:
+                    # another thread has evicted it
+                    pass
+
+            return value
+
+        return None
+
+    def put(self, key, value):
+
+        max_size = self.max_size() if callable(self.max_size) else self.max_size
+
+        try:
+            while key not in self.mapping and len(self.mapping) >= max_size:
+                del self.mapping[next(iter(self.mapping))]
+        except (KeyError, RuntimeError, StopIteration):
+            # another thread has modified the cache, it is fine to skip eviction once
+            pass
+
+        self.mapping[key] = value
+
+
+class RemapCache(BoundedCache):
+
+    def __init__(self, max_size=None, name='remap'):
+        """
+        memo of symbol -> nearest unit, see BoundedCache
+
+        :param max_size: max number of entries, PhonePieceConfig.remap_cache_size by default
+        :param name: name of the cache in its statistics
+        """
+
+        super().__init__(PhonePieceConfig.remap_cache_size if max_size is None else max_size, name)
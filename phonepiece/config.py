@@ -1,6 +1,6 @@
-import platform
 from pathlib import Path
 import logging
+import os
 
 
 class PhonePieceConfig:
@@ -11,4 +11,61 @@ class PhonePieceConfig:
     data_path = root_path / 'data'
     data_str = str(data_path)
 
-    logger = logging.getLogger('phonepiece')
\ No newline at end of file
+    # directory of the compiled artifacts built from the data files (e.g. ipa.db), None to look it up with find_cache_path
+    cache_path = None
+
+    logger = logging.getLogger('phonepiece')
+
+    # max number of symbols memorized by IPA.normalize
+    normalize_cache_size = 100000
+
+    # max number of candidate lists indexed by IPA.index_candidates
+    candidate_cache_size = 1024
+
+    # max number of inventories cached by read_inventory
+    inventory_cache_size = 256
+
+    # max number of symbols memorized by each nearest phone/phoneme cache of Inventory and Unit
+    remap_cache_size = 100000
+
+    # seconds between two log lines of cache statistics (see phonepiece.cache.CacheStats), None to disable
+    stats_log_interval = None
+
+    # max number of inventory pairs cached by read_inventory_mapping
+    mapping_cache_size = 4096
+
+
+def find_cache_path():
+    """
+    find the directory of the compiled artifacts: PhonePieceConfig.cache_path if it is set, otherwise the first
+    writable one of $PHONEPIECE_CACHE, $XDG_CACHE_HOME/phonepiece (~/.cache/phonepiece by default) and the data
+    directory of the package, which is read-only on system-wide installs
+
+    :return: Path of the directory, None if no directory is writable
+    """
+
+    if PhonePieceConfig.cache_path is not None:
+        return Path(PhonePieceConfig.cache_path)
+
+    candidates = []
+
+    if os.environ.get('PHONEPIECE_CACHE'):
+        candidates.append(Path(os.environ['PHONEPIECE_CACHE']))
+
+    if os.environ.get('XDG_CACHE_HOME'):
+        candidates.append(Path(os.environ['XDG_CACHE_HOME']) / 'phonepiece')
+    else:
+        candidates.append(Path('~/.cache/phonepiece').expanduser())
+
+    candidates.append(PhonePieceConfig.data_path / 'cache')
+
+    for path in candidates:
+        try:
+            path.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            continue
+
+        if os.access(path, os.W_OK):
+            return path
+
+    return None
@@ -1,6 +1,4 @@
 import sys
-from phonepiece.ipa import read_ipa
-import editdistance
 
 def print_result(string_lst, out=None):
 
@@ -14,118 +12,327 @@ def fuzzy_match(pattern, text):
     """
     find the best edit distance
 
+    the cost of every end position is computed by a bit-parallel scan (see fuzzy_scan),
+    then the start is recovered by a backtrace in a small window before the best end
+
     :param string_a: pattern
     :param string_b: text
     :return: matched string part
     """
 
-    string_b = pattern
-    string_a = text
+    # empty patterns match the empty prefix
+    if len(pattern) == 0:
+        return naive_fuzzy_match(pattern, text)
 
-    # length of each string
-    len_a = len(string_a)
-    len_b = len(string_b)
+    best, _ = fuzzy_scan([pattern], text)
+    mincost, best_end_index = best[0]
 
-    # dp table
-    # its contents is edit distance, dx, dy to the best previous path
-    dp = [[(0, -1, -1) for x in range(len_a+1)] for y in range(len_b+1)]
+    best_start_index = fuzzy_match_start(pattern, text, best_end_index)
 
-    # initialize first row and first column
-    for i in range(len_a+1):
-        dp[0][i] = [0, 0, 0]
+    return mincost, best_start_index, best_end_index - 1
 
-    for i in range(len_b+1):
-        dp[i][0] = [i, -1, 0]
 
-    # dp update
-    for i in range(1, len_b+1):
-        for j in range(1, len_a+1):
-            index_a = j-1
-            index_b = i-1
-            cost = 0 if string_a[index_a] == string_b[index_b] else 1
+def fuzzy_match_all(pattern, text, max_cost):
+    """
+    find all approximate occurrences of pattern in text
 
-            if dp[i-1][j][0] < dp[i][j-1][0]:
-                dx = -1
-                dy = 0
-                mincost = dp[i-1][j][0] + 1
-            else:
-                dx = 0
-                dy = -1
-                mincost = dp[i][j-1][0] + 1
+    :param pattern: a string or a list of phones
+    :param text: a string or a list of phones
+    :param max_cost: max edit distance of an occurrence
+    :return: list of (cost, start index, end index) for every end index whose best cost is at most max_cost
+    """
 
-            if dp[i-1][j-1][0] + cost < mincost:
-                dx = -1
-                dy = -1
-                mincost = dp[i-1][j-1][0] + cost
+    return fuzzy_match_multi([pattern], text, max_cost)[0]
 
-            dp[i][j] = [mincost, dx, dy]
 
+def fuzzy_match_multi(patterns, text, max_cost):
+    """
+    find all approximate occurrences of many patterns (e.g. keywords) with a single scan of text
 
-    mincost = 10000000
-    best_start_index = 0
-    best_end_index = len_b
+    :param patterns: list of strings or lists of phones, each pattern is not empty
+    :param text: a string or a list of phones
+    :param max_cost: max edit distance of an occurrence
+    :return: list of fuzzy_match_all results, one per pattern
+    """
 
-    for i in range(len_a+1):
-        if dp[len_b][i][0] < mincost:
-            mincost = dp[len_b][i][0]
-            best_end_index = i
+    _, matches = fuzzy_scan(patterns, text, max_cost)
 
+    return [[(cost, fuzzy_match_start(pattern, text, end), end - 1) for end, cost in pattern_matches]
+            for pattern, pattern_matches in zip(patterns, matches)]
 
-    # backward to get the best_start_index
+
+def fuzzy_scan(patterns, text, max_cost=None):
+    """
+    bit-parallel approximate search (Myers, Hyyrö) of many patterns over text.
+
+    the vertical deltas of the dp column of every pattern are packed into the bits of one integer,
+    each pattern being followed by a guard bit which stops carries and shifts from leaking into the next pattern.
+    a column of all patterns is then updated with a few integer operations per text symbol
+
+    :param patterns: list of not empty strings or lists of phones
+    :param text: a string or a list of phones
+    :param max_cost: also collect every end position whose cost is at most max_cost
+    :return: (list of (best cost, end position) per pattern, list of (end position, cost) lists per pattern).
+             end positions are dp columns: position j ends after text[j-1], the first best one is reported
+    """
+
+    symbol2id = dict()
+    offsets = []
+    peq = dict()
+
+    offset = 0
+
+    for pattern in patterns:
+        assert len(pattern) > 0
+
+        offsets.append(offset)
+
+        for i, symbol in enumerate(pattern):
+            code = symbol2id.setdefault(symbol, len(symbol2id))
+            peq[code] = peq.get(code, 0) | (1 << (offset + i))
+
+        offset += len(pattern) + 1
+
+    mask = 0
+    high_bits = []
+
+    for pattern, offset in zip(patterns, offsets):
+        mask |= ((1 << len(pattern)) - 1) << offset
+        high_bits.append(1 << (offset + len(pattern) - 1))
+
+    # symbols of text which do not appear in any pattern never match
+    eqs = [peq.get(symbol2id.get(symbol, -1), 0) for symbol in text]
+
+    # column 0: deleting the whole pattern
+    scores = [len(pattern) for pattern in patterns]
+    best = [(score, 0) for score in scores]
+    matches = [[] for _ in patterns]
+
+    pv = mask
+    mv = 0
+
+    for j, eq in enumerate(eqs, 1):
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+
+        for k, high_bit in enumerate(high_bits):
+            if ph & high_bit:
+                scores[k] += 1
+            elif mh & high_bit:
+                scores[k] -= 1
+
+            if scores[k] < best[k][0]:
+                best[k] = (scores[k], j)
+
+            if max_cost is not None and scores[k] <= max_cost:
+                matches[k].append((j, scores[k]))
+
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+
+    return best, matches
+
+
+def fuzzy_match_start(pattern, text, end):
+    """
+    start index of the best alignment of pattern ending at dp column end, with the backtrace of naive_fuzzy_match.
+
+    an alignment of a pattern prefix of length i costs at most i and covers at most 2*i text symbols,
+    so the backtrace only depends on the dp in the last 3*len(pattern)+2 columns before end
+
+    :param pattern: a string or a list of phones
+    :param text: a string or a list of phones
+    :param end: dp column where the alignment ends
+    :return: start index in text
+    """
+
+    len_b = len(pattern)
+    window_start = max(0, end - 3 * len_b - 2)
+    window = text[window_start:end]
+    len_a = len(window)
+
+    # dp restricted to the window, with the same tie-breaking as naive_fuzzy_match
+    # its contents is edit distance and the step (dx, dy) to the best previous cell
+    dp = [[0] * (len_a+1)] + [[i] + [0] * len_a for i in range(1, len_b+1)]
+    step = [[(0, 0)] * (len_a+1)] + [[(-1, 0)] + [None] * len_a for i in range(1, len_b+1)]
+
+    for i in range(1, len_b+1):
+        symbol = pattern[i-1]
+        prev_row = dp[i-1]
+        row = dp[i]
+        step_row = step[i]
+
+        for j in range(1, len_a+1):
+            if prev_row[j] < row[j-1]:
+                mincost = prev_row[j] + 1
+                step_row[j] = (-1, 0)
+            else:
+                mincost = row[j-1] + 1
+                step_row[j] = (0, -1)
+
+            diag = prev_row[j-1] + (0 if window[j-1] == symbol else 1)
+
+            if diag < mincost:
+                mincost = diag
+                step_row[j] = (-1, -1)
+
+            row[j] = mincost
+
+    # backward to get the start
     cx = len_b
-    cy = best_end_index
+    cy = len_a
 
     while cx != 0:
-        dx = dp[cx][cy][1]
-        dy = dp[cx][cy][2]
-
+        dx, dy = step[cx][cy]
         cx += dx
         cy += dy
 
-    best_start_index = cy
-    best_end_index -= 1
+    return window_start + cy
 
-    return mincost, best_start_index, best_end_index
 
 def fast_edit_distance(string_a, string_b):
+    import editdistance
     return editdistance.distance(string_a, string_b)
 
-def edit_distance(string_a, string_b, utt_id='utt_id', verbose=False, out=None):
+def encode_symbols(string_a, string_b):
+    """
+    encode the symbols of two sequences as integers, equal symbols share the same id
+
+    :param string_a: a string or a list of symbols
+    :param string_b: a string or a list of symbols
+    :return: two int64 arrays
+    """
+
+    import numpy as np
+
+    symbol2id = dict()
+
+    codes_a = np.array([symbol2id.setdefault(symbol, len(symbol2id)) for symbol in string_a], dtype=np.int64)
+    codes_b = np.array([symbol2id.setdefault(symbol, len(symbol2id)) for symbol in string_b], dtype=np.int64)
+
+    return codes_a, codes_b
+
+
+# directions of edit_distance_table: from (i-1, j-1), from (i-1, j) and from (i, j-1)
+_diag = 0
+_up = 1
+_left = 2
+
+# edit_distance fills tables whose rows (string_a) are at most this long with scalar_edit_distance_table.
+# each numpy row costs about 10us whatever its length, a python cell about 0.2us: they break even around 60 symbols
+_scalar_max_len = 64
+
+
+def scalar_edit_distance_table(string_a, string_b):
+    """
+    same as edit_distance_table, filled cell by cell with python lists, which is faster for short sequences
+
+    :param string_a: a string or a list of symbols
+    :param string_b: a string or a list of symbols
+    :return: edit distance and (len_b+1) lists of (len_a+1) directions
+    """
 
-    # length of each string
     len_a = len(string_a)
     len_b = len(string_b)
 
-    # dp table
-    dp = [[0 for x in range(len_a+1)] for y in range(len_b+1)]
-    path = [[(0, 0) for x in range(len_a+1)] for y in range(len_b+1)]
-
-    # initialize first row and first column
-    for i in range(1, len_a+1):
-        dp[0][i] = i
-        path[0][i] = (0, i-1)
+    prev = list(range(len_a+1))
+    path = [[_left] * (len_a+1)]
 
     for i in range(1, len_b+1):
-        dp[i][0] = i
-        path[i][0] = (i-1, 0)
+        symbol = string_b[i-1]
+
+        cur = [i] + [0] * len_a
+        row = [_up] + [_diag] * len_a
 
-    # dp update
-    for i in range(1, len_b+1):
         for j in range(1, len_a+1):
-            index_a = j-1
-            index_b = i-1
-            cost = 0.0 if string_a[index_a] == string_b[index_b] else 1.0
+            best = prev[j-1] + (0 if string_a[j-1] == symbol else 1)
+
+            if best > prev[j] + 1:
+                best = prev[j] + 1
+                row[j] = _up
+
+            if best > cur[j-1] + 1:
+                best = cur[j-1] + 1
+                row[j] = _left
+
+            cur[j] = best
 
-            dp[i][j] = dp[i-1][j-1]+cost
-            path[i][j] = (i-1,j-1)
+        prev = cur
+        path.append(row)
 
-            if dp[i][j] > dp[i-1][j]+1:
-                dp[i][j] = dp[i-1][j]+1
-                path[i][j] = (i-1,j)
+    return prev[len_a], path
 
-            if dp[i][j] > dp[i][j-1]+1:
-                dp[i][j] = dp[i][j-1]+1
-                path[i][j] = (i, j-1)
+
+def edit_distance_table(string_a, string_b):
+    """
+    edit distance dp between string_a (columns) and string_b (rows), filled one row at a time.
+
+    within a row, the chain of insertions dp[i][j] = min(t[j], dp[i][j-1]+1) is a running minimum of t[k]-k,
+    where t[j] is the best of the substitution and the deletion.
+    ties prefer the substitution, then (i-1, j), then (i, j-1)
+
+    :param string_a: a string or a list of symbols
+    :param string_b: a string or a list of symbols
+    :return: edit distance and (len_b+1, len_a+1) int8 direction array
+    """
+
+    import numpy as np
+
+    len_a = len(string_a)
+    len_b = len(string_b)
+
+    codes_a, codes_b = encode_symbols(string_a, string_b)
+
+    path = np.empty((len_b+1, len_a+1), dtype=np.int8)
+    path[0, :] = _left
+    path[:, 0] = _up
+
+    offsets = np.arange(len_a+1, dtype=np.int64)
+    prev = offsets.copy()
+    cur = np.empty(len_a+1, dtype=np.int64)
+
+    for i in range(1, len_b+1):
+
+        diag = prev[:-1] + (codes_a != codes_b[i-1])
+        up = prev[1:] + 1
+
+        # best of substitution and deletion, with the row start as t[0]
+        cur[0] = i
+        cur[1:] = np.minimum(diag, up)
+        best = cur.copy()
+
+        cur = np.minimum.accumulate(cur - offsets) + offsets
+
+        row = path[i, 1:]
+        row[:] = np.where(up < diag, _up, _diag)
+        row[cur[1:] < best[1:]] = _left
+
+        prev, cur = cur, prev
+
+    return int(prev[len_a]), path
+
+
+def edit_distance(string_a, string_b, utt_id='utt_id', verbose=False, out=None):
+
+    # length of each string
+    len_a = len(string_a)
+    len_b = len(string_b)
+
+    # numpy rows only pay off on long sequences
+    if len_a <= _scalar_max_len:
+        err, path = scalar_edit_distance_table(string_a, string_b)
+    else:
+        err, path = edit_distance_table(string_a, string_b)
+
+    # distances are float whenever a substitution is considered
+    if len_a > 0 and len_b > 0:
+        err = float(err)
 
     hyp_lst = []
     ref_lst = []
@@ -141,8 +348,12 @@ def edit_distance(string_a, string_b, utt_id='utt_id', verbose=False, out=None):
     del_lst = []
     sub_lst = []
 
+    # row and column offsets of each direction
+    steps = [(1, 1), (1, 0), (0, 1)]
+
     while(cur_node != (0,0)):
-        prev_node = path[cur_node[0]][cur_node[1]]
+        di, dj = steps[path[cur_node[0]][cur_node[1]]]
+        prev_node = (cur_node[0] - di, cur_node[1] - dj)
 
         # substitution or match
         if prev_node[0]+1 == cur_node[0] and prev_node[1]+1 == cur_node[1]:
@@ -182,7 +393,7 @@ def edit_distance(string_a, string_b, utt_id='utt_id', verbose=False, out=None):
 
         out.write("-"*80+'\n')
         out.write(f"UTT: {utt_id}\n")
-        out.write(f"ERR {dp[len_b][len_a]}: ADD {add_cnt}, DEL {del_cnt}, SUB {sub_cnt}\n")
+        out.write(f"ERR {err}: ADD {add_cnt}, DEL {del_cnt}, SUB {sub_cnt}\n")
         hyp_lst.append("HYP: ")
         ref_lst.append("REF: ")
         ops_lst.append("OPS: ")
@@ -195,7 +406,35 @@ def edit_distance(string_a, string_b, utt_id='utt_id', verbose=False, out=None):
         print_result(hyp_lst, out)
         print_result(ops_lst, out)
 
-    return dp[len_b][len_a], add_cnt, del_cnt, sub_cnt, add_lst, del_lst, sub_lst
+    return err, add_cnt, del_cnt, sub_cnt, add_lst, del_lst, sub_lst
+
+
+def substitution_costs(string_a, string_b):
+    """
+    ipa.distance of every pair of symbols, computed once per pair of distinct symbols
+
+    :param string_a: list of phones
+    :param string_b: list of phones
+    :return: (len(string_b), len(string_a)) float64 array
+    """
+
+    import numpy as np
+    from phonepiece.ipa import read_ipa
+
+    ipa = read_ipa()
+
+    symbols_a = list(dict.fromkeys(string_a))
+    symbols_b = list(dict.fromkeys(string_b))
+
+    index_a = {symbol: i for i, symbol in enumerate(symbols_a)}
+    index_b = {symbol: i for i, symbol in enumerate(symbols_b)}
+
+    costs = ipa.distance_matrix(symbols_b, symbols_a)
+
+    rows = np.array([index_b[symbol] for symbol in string_b], dtype=np.int64)
+    cols = np.array([index_a[symbol] for symbol in string_a], dtype=np.int64)
+
+    return costs[np.ix_(rows, cols)]
 
 
 def phonological_distance(string_a, string_b):
@@ -206,7 +445,36 @@ def phonological_distance(string_a, string_b):
     if ' ' in string_b:
         string_b = string_b.split(' ')
 
-    ipa = read_ipa()
+    import numpy as np
+
+    # length of each string
+    len_a = len(string_a)
+    len_b = len(string_b)
+
+    if len_a == 0 or len_b == 0:
+        return len_a + len_b
+
+    sub_costs = substitution_costs(string_a, string_b)
+
+    # dp table
+    dp = np.empty((len_b+1, len_a+1), dtype=np.float64)
+
+    # initialize first row and first column
+    dp[0, :] = np.arange(len_a+1)
+    dp[:, 0] = np.arange(len_b+1)
+
+    # dp update along anti-diagonals: every cell of a diagonal only depends on the previous two diagonals,
+    # each cell is computed with the same operations as the cell-by-cell update
+    for d in range(2, len_a+len_b+1):
+        i = np.arange(max(1, d-len_a), min(len_b, d-1)+1)
+        j = d - i
+
+        dp[i, j] = np.minimum(dp[i-1, j-1]+sub_costs[i-1, j-1], np.minimum(dp[i-1, j]+1, dp[i, j-1]+1))
+
+    return float(dp[len_b, len_a])
+
+
+def naive_edit_distance(string_a, string_b):
 
     # length of each string
     len_a = len(string_a)
@@ -227,38 +495,88 @@ def phonological_distance(string_a, string_b):
         for j in range(1, len_a+1):
             index_a = j-1
             index_b = i-1
-            sub_cost = ipa.distance(string_a[index_a], string_b[index_b])
-            dp[i][j] = min(dp[i-1][j-1]+sub_cost, min(dp[i-1][j]+1, dp[i][j-1]+1))
+            cost = 0.0 if string_a[index_a] == string_b[index_b] else 1.0
+            dp[i][j] = min(dp[i-1][j-1]+cost, min(dp[i-1][j]+1, dp[i][j-1]+1))
 
     return dp[len_b][len_a]
 
 
-def naive_edit_distance(string_a, string_b):
+def naive_fuzzy_match(pattern, text):
+    """
+    find the best edit distance
+
+    :param string_a: pattern
+    :param string_b: text
+    :return: matched string part
+    """
+
+    string_b = pattern
+    string_a = text
 
     # length of each string
     len_a = len(string_a)
     len_b = len(string_b)
 
     # dp table
-    dp = [[0 for x in range(len_a+1)] for y in range(len_b+1)]
+    # its contents is edit distance, dx, dy to the best previous path
+    dp = [[(0, -1, -1) for x in range(len_a+1)] for y in range(len_b+1)]
 
     # initialize first row and first column
     for i in range(len_a+1):
-        dp[0][i] = i
+        dp[0][i] = [0, 0, 0]
 
     for i in range(len_b+1):
-        dp[i][0] = i
+        dp[i][0] = [i, -1, 0]
 
     # dp update
     for i in range(1, len_b+1):
         for j in range(1, len_a+1):
             index_a = j-1
             index_b = i-1
-            cost = 0.0 if string_a[index_a] == string_b[index_b] else 1.0
-            dp[i][j] = min(dp[i-1][j-1]+cost, min(dp[i-1][j]+1, dp[i][j-1]+1))
+            cost = 0 if string_a[index_a] == string_b[index_b] else 1
+
+            if dp[i-1][j][0] < dp[i][j-1][0]:
+                dx = -1
+                dy = 0
+                mincost = dp[i-1][j][0] + 1
+            else:
+                dx = 0
+                dy = -1
+                mincost = dp[i][j-1][0] + 1
+
+            if dp[i-1][j-1][0] + cost < mincost:
+                dx = -1
+                dy = -1
+                mincost = dp[i-1][j-1][0] + cost
+
+            dp[i][j] = [mincost, dx, dy]
+
+
+    mincost = 10000000
+    best_start_index = 0
+    best_end_index = len_b
+
+    for i in range(len_a+1):
+        if dp[len_b][i][0] < mincost:
+            mincost = dp[len_b][i][0]
+            best_end_index = i
 
-    return dp[len_b][len_a]
 
+    # backward to get the best_start_index
+    cx = len_b
+    cy = best_end_index
+
+    while cx != 0:
+        dx = dp[cx][cy][1]
+        dy = dp[cx][cy][2]
+
+        cx += dx
+        cy += dy
+
+    best_start_index = cy
+    best_end_index -= 1
+
+    return mincost, best_start_index, best_end_index
 
 def group_edit_distance(string_b, string_a, grp_dict, grp_err, grp_cnt):
     # length of each string
@@ -49,17 +49,23 @@ def read_epitran_g2p(lang_id_or_g2p_id, writing_system=None):
         orth, phon = next(reader)
         if orth != 'Orth' or phon != 'Phon':
             raise DatafileError(f'Header is ["{orth}", "{phon}"] instead of ["Orth", "Phon"].')
+        rows = []
         for (i, fields) in enumerate(reader):
             try:
                 graph, phons = fields
             except ValueError as malformed_data_file:
                 raise DatafileError(f'Map file is not well formed at line {i + 2}.') from malformed_data_file
 
-            phons = ipa.tokenize(phons)
-            for phon in phons:
-                graph = unicodedata.normalize('NFC', graph)
-                phon = unicodedata.normalize('NFC', phon)
-                phon = re.sub('[˩˨˧˦˥]', '', phon)
-                g2p[graph].append(phon)
+            rows.append((graph, phons))
+
+    # tokenize the whole file in one call
+    phons_lst = ipa.tokenize_batch([phons for _, phons in rows])
+
+    for (graph, _), phons in zip(rows, phons_lst):
+        for phon in phons:
+            graph = unicodedata.normalize('NFC', graph)
+            phon = unicodedata.normalize('NFC', phon)
+            phon = re.sub('[˩˨˧˦˥]', '', phon)
+            g2p[graph].append(phon)
 
     return g2p
\ No newline at end of file
@@ -1,17 +1,26 @@
 from phonepiece.config import *
-from phonepiece.unit import read_unit, write_unit, create_unit
-from phonepiece.ipa import read_ipa
+from phonepiece.unit import parse_unit, write_unit, create_unit
 from phonepiece.lang import normalize_lang_id
 from collections import defaultdict
 from phonepiece.utils import load_lang_dir
+from phonepiece.cache import BoundedCache, RemapCache
+import hashlib
+import os
 
 
-def read_inventory(lang_id_or_path, model_name='latest', base=False):
+# process-wide cache of inventories: key -> (inventory, files to check, their mtimes)
+_inventory_cache = BoundedCache(lambda: PhonePieceConfig.inventory_cache_size, 'inventories', lru=True)
+
+
+def read_inventory(lang_id_or_path, model_name='latest', base=False, remap_table=False):
     """
-    read inventory of the lang_id from a prebuilt inventory model or a customized local path
+    read inventory of the lang_id from a prebuilt inventory model or a customized local path.
+    inventories are cached process-wide by (lang_id, model_name, base), so repeated calls return
+    the same object and share its remap caches. customized paths are reloaded when their files change.
 
     :param lang_id: a 3 char or 2 char iso id
     :param model_name: model name or a customized path
+    :param remap_table: precompute the nearest phoneme/phone of every ipa symbol, see Inventory.load_remap_table
     :type lang_id_or_path:
     :return:
     :rtype:
@@ -21,6 +30,142 @@ def read_inventory(lang_id_or_path, model_name='latest', base=False):
     if lang_id_or_path == 'ipa':
         return read_ipa_inventory()
 
+    inventory = read_cached_inventory(lang_id_or_path, model_name, base)
+
+    if remap_table and inventory.phoneme_remap_table is None:
+        inventory.load_remap_table()
+
+    return inventory
+
+
+def read_inventories(lang_ids=None, model_name='latest', base=False):
+    """
+    read inventories of many languages of a model, languages are read from the model bundle when it is packed
+
+    :param lang_ids: list of language ids, all languages in the model bundle by default
+    :param model_name: model name
+    :return: dict of lang_id -> Inventory
+    """
+
+    if lang_ids is None:
+        from phonepiece.bundle import read_inventory_bundle
+        bundle = read_inventory_bundle(model_name)
+        assert bundle is not None, f"model {model_name} has no inventory bundle, run phonepiece.bin.pack_model first"
+
+        lang_ids = [lang.lstrip('_') for lang in bundle.langs if len(lang.lstrip('_')) == 3]
+
+    return {lang_id: read_inventory(lang_id, model_name, base) for lang_id in lang_ids}
+
+
+def read_base_projections(lang_ids=None, model_name='latest'):
+    """
+    project the phones of many languages to the ipa base phones at once, as read_inventory(base=True) does
+
+    :param lang_ids: list of language ids, all languages in the model bundle by default
+    :param model_name: model name
+    :return: dict of lang_id -> dict of phone -> base phone
+    """
+
+    from phonepiece.ipa import read_ipa
+    ipa = read_ipa()
+
+    inventories = read_inventories(lang_ids, model_name)
+
+    # languages share most of their phones, each distinct phone is projected once
+    phones = sorted(set(phone for inv in inventories.values() for phone in inv.phone2phoneme if phone not in ['<blk>', '<eos>']))
+    phone2base = dict(zip(phones, ipa.compute_base_phones(phones)))
+
+    return {lang_id: {phone: phone2base[phone] for phone in inv.phone2phoneme if phone in phone2base}
+            for lang_id, inv in inventories.items()}
+
+
+def read_cached_inventory(lang_id_or_path, model_name='latest', base=False):
+    """
+    look up the process-wide cache, or load the inventory and cache it
+
+    :param lang_id: a 3 char or 2 char iso id or a customized path
+    :param model_name: model name or a customized path
+    :return: Inventory
+    """
+
+    key = inventory_cache_key(lang_id_or_path, model_name, base)
+
+    # concurrent misses of the same key load the inventory once
+    inventory, _, _ = _inventory_cache.get_or_compute(key, load_inventory_entry, is_valid=is_fresh_inventory_entry)
+
+    return inventory
+
+
+def load_inventory_entry(key):
+    """
+    load the inventory of a cache key and stamp the files it is read from
+
+    :param key: see inventory_cache_key
+    :return: (inventory, files to check, their mtimes)
+    """
+
+    lang_id_or_path, model_name, base = key
+    inventory = load_inventory(lang_id_or_path, model_name, base)
+
+    # prebuilt models do not change, customized paths are checked by mtime
+    stamp_files = None
+    stamp = None
+
+    if PhonePieceConfig.data_path / 'model' not in inventory.lang_dir.parents:
+        stamp_files = [inventory.lang_dir / name for name in ['phone.txt', 'phoneme.txt', 'allophone.txt']]
+        stamp = file_stamp(stamp_files)
+
+    return inventory, stamp_files, stamp
+
+
+def is_fresh_inventory_entry(entry):
+    _, stamp_files, stamp = entry
+    return stamp_files is None or file_stamp(stamp_files) == stamp
+
+
+def inventory_cache_key(lang_id_or_path, model_name='latest', base=False):
+
+    if Path(lang_id_or_path).exists():
+        return (str(Path(lang_id_or_path).resolve()), 'customized', base)
+
+    return (normalize_lang_id(lang_id_or_path), model_name, base)
+
+
+def file_stamp(files):
+    return [file.stat().st_mtime_ns if file.exists() else None for file in files]
+
+
+def evict_inventory(lang_id_or_path, model_name='latest', base=False):
+    """
+    remove an inventory from the process-wide cache, it will be reloaded by the next read_inventory
+
+    :param lang_id_or_path: a 3 char or 2 char iso id or a customized path
+    :param model_name: model name or a customized path
+    :param base: base flag used to read the inventory
+    """
+
+    key = inventory_cache_key(lang_id_or_path, model_name, base)
+
+    _inventory_cache.pop(key)
+
+
+def clear_inventory_cache():
+    """
+    remove all inventories from the process-wide cache
+    """
+
+    _inventory_cache.clear()
+
+
+def load_inventory(lang_id_or_path, model_name='latest', base=False):
+    """
+    read inventory without the process-wide cache, see read_inventory
+
+    :param lang_id: a 3 char or 2 char iso id
+    :param model_name: model name or a customized path
+    :return: Inventory
+    """
+
     if Path(lang_id_or_path).exists():
         lang_dir = Path(lang_id_or_path).resolve()
         lang_id = lang_dir.stem
@@ -34,31 +179,47 @@ def read_inventory(lang_id_or_path, model_name='latest', base=False):
             if len(lang_id) != 2 and len(lang_id) != 3:
                 lang_id = 'unknown'
 
+        sources = None
+
     else:
-        # load or download lang dir
         assert len(lang_id_or_path) == 2 or len(lang_id_or_path) == 3
 
-        lang_id = lang_id_or_path
-        lang_dir = load_lang_dir(lang_id, model_name)
-
         # normalize language id (e.g: 2 char 639-1 -> 3 char 639-3)
-        lang_id = normalize_lang_id(lang_id)
+        lang_id = normalize_lang_id(lang_id_or_path)
+
+        # read from the packed bundle of the model if available, otherwise load or download lang dir
+        from phonepiece.bundle import read_bundle_sources
+        sources = read_bundle_sources(lang_id, model_name)
+
+        if sources is None:
+            lang_dir = load_lang_dir(lang_id, model_name)
+
+    if sources is None:
+        sources = []
+        for name in ['phone.txt', 'phoneme.txt', 'allophone.txt']:
+            with open(lang_dir / name, encoding='utf-8') as f:
+                sources.append(f.read().splitlines())
+    else:
+        lang_dir = sources[3]
+
+    phone_lines, phoneme_lines, allophone_lines = sources[:3]
 
     ipa = None
 
     if not base:
-        phone_unit = read_unit(lang_dir / 'phone.txt')
+        phone_unit = parse_unit(phone_lines)
     else:
+        from phonepiece.ipa import read_ipa
         ipa = read_ipa()
         phone_unit = create_unit(ipa.base_phones)
 
-    phoneme_unit = read_unit(lang_dir / 'phoneme.txt')
+    phoneme_unit = parse_unit(phoneme_lines)
     phone2phoneme = defaultdict(list)
     phoneme2phone = defaultdict(list)
 
 
     # use allophone file if allovera supports it
-    for line in open(lang_dir / 'allophone.txt', encoding='utf-8'):
+    for line in allophone_lines:
         fields = line.strip().split()
         phoneme = fields[0]
 
@@ -78,10 +239,16 @@ def read_inventory(lang_id_or_path, model_name='latest', base=False):
     phoneme2phone['<blk>'] = ['<blk>']
     phoneme2phone['<eos>'] = ['<eos>']
 
-    return Inventory(lang_id, model_name, phoneme_unit, phone_unit, phone2phoneme, phoneme2phone)
+    inventory = Inventory(lang_id, model_name, phoneme_unit, phone_unit, phone2phoneme, phoneme2phone)
+    inventory.lang_dir = lang_dir
+    inventory.base = base
+
+    return inventory
 
 
 def read_ipa_inventory():
+    from phonepiece.ipa import read_ipa
+
     lang_id = 'ipa'
     model_name = 'ipa_base'
 
@@ -232,16 +399,176 @@ class Inventory:
         self.phone2phoneme = phone2phoneme
         self.phoneme2phone = phoneme2phone
         self.model_name = model_name
-        self.ipa = read_ipa()
-        self.nearest_mapping = dict()
-        self.phone_nearest_mapping = dict()
+
+        # directory of the inventory files, None if it is not read from files
+        self.lang_dir = None
+
+        # whether phones are projected to the ipa base phones
+        self.base = False
+
+        # ipa is loaded on first use
+        self._ipa = None
+        self.nearest_mapping = RemapCache(name=f'{lang_id} nearest phoneme')
+        self.phone_nearest_mapping = RemapCache(name=f'{lang_id} nearest phone')
+
+        # compute functions of the caches, bound once instead of on every lookup
+        self.nearest_phoneme_compute = self.compute_nearest_phoneme
+        self.nearest_phone_compute = self.compute_nearest_phone
+
+        # nearest phoneme/phone of every ipa symbol (indexed by its row in ipa), see build_remap_table
+        self.phoneme_remap_table = None
+        self.phone_remap_table = None
+
+        # direction -> projection between phone ids and phoneme ids, see get_projection
+        self.projection = dict()
+
+    @property
+    def ipa(self):
+        if self._ipa is None:
+            from phonepiece.ipa import read_ipa
+            self._ipa = read_ipa()
+
+        return self._ipa
+
+    def __getstate__(self):
+        # the ipa singleton may be memory-mapped, it is read again in the unpickled process
+        state = self.__dict__.copy()
+        state['_ipa'] = None
+        return state
 
     def __str__(self):
         return f"<Inventory {self.lang_id} ({self.model_name}) phoneme: {len(self.phoneme)}, phone: {len(self.phone)}>"
 
+    def fingerprint(self):
+        """
+        content fingerprint of the phoneme and phone units
+
+        :return: hex digest
+        """
+
+        sha = hashlib.sha1()
+
+        for unit in [self.phoneme, self.phone]:
+            sha.update('\t'.join(str(elem) for elem in unit.elems).encode('utf-8'))
+            sha.update(b'\n')
+
+        return sha.hexdigest()
+
+    def compute_remap_table(self, unit):
+        """
+        compute the nearest unit of every ipa symbol in one sweep.
+        this is the same decision as ipa.most_similar over the inventory units
+
+        :param unit: self.phoneme or self.phone
+        :return: int32 array, the i-th entry is the id of the nearest unit of ipa.phones[i]
+        """
+
+        import numpy as np
+
+        targets = list(unit.unit_to_id.keys())[1:-1]
+        target_ids = np.array([unit.unit_to_id[target] for target in targets], dtype=np.int32)
+        positions, rows = self.ipa.index_candidates(targets)
+
+        # ipa.most_similar falls back to the first target if no target has a valid feature
+        if len(rows) == 0:
+            return np.full(len(self.ipa.phones), target_ids[0], dtype=np.int32)
+
+        feature_index = self.ipa.feature_index
+        if feature_index is None:
+            feature_index = self.ipa.build_feature_index()
+
+        # (num_target, num_ipa) weighted distances, argmin picks the first target on ties
+        distances = self.ipa.feature_costs(rows) @ feature_index.T
+
+        return target_ids[positions[np.argmin(distances, axis=0)]]
+
+    def build_remap_table(self):
+        """
+        precompute the nearest phoneme and nearest phone of every ipa symbol,
+        so that get_nearest_phoneme and get_nearest_phone become table lookups
+        """
+
+        if len(self.phoneme) <= 2 or len(self.phone) <= 2:
+            return
+
+        self.phoneme_remap_table = self.compute_remap_table(self.phoneme)
+        self.phone_remap_table = self.compute_remap_table(self.phone)
+
+    def load_remap_table(self):
+        """
+        load the remap table stored alongside the inventory files, or build and store it.
+        the stored table is rebuilt when the inventory or the ipa database changes
+        """
+
+        import numpy as np
+
+        if self.lang_dir is None:
+            self.build_remap_table()
+            return
+
+        table_name = 'remap_base.npz' if self.base else 'remap.npz'
+        table_path = self.lang_dir / table_name
+        fingerprint = f"{self.ipa.source_hash}:{self.fingerprint()}"
+
+        if table_path.exists():
+            try:
+                # the npz file stays open until it is closed, which would block os.replace on windows
+                with np.load(table_path) as table:
+                    if str(table['fingerprint']) == fingerprint and len(table['phoneme']) == len(self.ipa.phones):
+                        self.phoneme_remap_table = table['phoneme']
+                        self.phone_remap_table = table['phone']
+                        return
+
+            except (OSError, ValueError, KeyError) as e:
+                PhonePieceConfig.logger.warning(f"could not read remap table {table_path}: {e}")
+
+        self.build_remap_table()
+
+        if self.phoneme_remap_table is None:
+            return
+
+        try:
+            tmp_path = self.lang_dir / f'{table_name}.{os.getpid()}.tmp.npz'
+            np.savez(tmp_path, fingerprint=np.array(fingerprint), phoneme=self.phoneme_remap_table, phone=self.phone_remap_table)
+            os.replace(tmp_path, table_path)
+        except OSError as e:
+            PhonePieceConfig.logger.warning(f"could not write remap table {table_path}: {e}")
+
+    def lookup_remap_table(self, phone, table, unit):
+        """
+        look up the nearest unit of phone from a remap table
+
+        :param phone: a random phone
+        :param table: self.phoneme_remap_table or self.phone_remap_table
+        :param unit: self.phoneme or self.phone
+        :return: nearest unit
+        """
+
+        row = self.ipa.phone2idx.get(self.ipa.normalize(phone))
+
+        # same fallback as ipa.most_similar: the first target
+        if row is None:
+            return list(unit.unit_to_id.keys())[1]
+
+        return unit.id_to_unit[int(table[row])]
+
     def __repr__(self):
         return self.__str__()
 
+    def get_stats(self):
+        """
+        statistics of the nearest phoneme/phone caches of this inventory and of the shared ipa normalize cache,
+        see phonepiece.cache.CacheStats
+
+        :return: dict
+        """
+
+        return {
+            'nearest_phoneme': self.nearest_mapping.stats.to_dict(),
+            'nearest_phone': self.phone_nearest_mapping.stats.to_dict(),
+            'ipa': self.ipa.get_stats(),
+        }
+
     def remap(self, phonemes_or_phones, broad=True, verbose=False):
 
         remapped_phones = []
@@ -274,6 +601,153 @@ class Inventory:
 
         return remapped_phones
 
+    def remap_batch(self, sequences, broad=True, as_ids=True, padded=False, padding_value=-1):
+        """
+        remap a batch of utterances at once. each distinct symbol in the batch is remapped only once
+
+        :param sequences: list of utterances, each is a string or a list of phonemes/phones
+        :param broad: remap to phonemes if True, otherwise to phones
+        :param as_ids: return ids instead of lists of units
+        :param padded: return a padded matrix instead of packed ids
+        :param padding_value: id used to pad the matrix
+        :return: if as_ids is False, a list of remapped unit lists (same as remap on each utterance).
+                 otherwise (ids, offsets) where ids is a packed int32 array and the i-th utterance is
+                 ids[offsets[i]:offsets[i+1]], or (matrix, lengths) if padded
+        """
+
+        import numpy as np
+        from itertools import chain
+
+        # tokenize all raw strings in one call
+        raw_index = [i for i, sequence in enumerate(sequences) if not isinstance(sequence, list)]
+        if len(raw_index) > 0:
+            sequences = list(sequences)
+            tokenized = self.ipa.tokenize_batch([sequences[i] for i in raw_index])
+            for i, tokens in zip(raw_index, tokenized):
+                sequences[i] = tokens
+
+        if broad:
+            unit = self.phoneme
+            get_nearest = self.get_nearest_phoneme
+        else:
+            unit = self.phone
+            get_nearest = self.get_nearest_phone
+
+        # remap each distinct symbol once, empty symbols are dropped as in remap
+        symbol2unit = dict()
+        for symbol in set(chain.from_iterable(sequences)):
+            if symbol is None or len(symbol.strip()) == 0:
+                symbol2unit[symbol] = None
+            else:
+                symbol2unit[symbol] = get_nearest(symbol)
+
+        if not as_ids:
+            return [[symbol2unit[symbol] for symbol in sequence if symbol2unit[symbol] is not None] for sequence in sequences]
+
+        symbol2id = {symbol: -1 if nearest is None else unit.unit_to_id[nearest] for symbol, nearest in symbol2unit.items()}
+
+        num_token = sum(len(sequence) for sequence in sequences)
+        codes = np.fromiter(map(symbol2id.__getitem__, chain.from_iterable(sequences)), dtype=np.int32, count=num_token)
+
+        # drop empty symbols and recount the length of each utterance
+        keep = codes >= 0
+        seq_index = np.repeat(np.arange(len(sequences)), [len(sequence) for sequence in sequences])
+        lengths = np.bincount(seq_index[keep], minlength=len(sequences)).astype(np.int64)
+        ids = codes[keep]
+
+        if padded:
+            max_len = int(lengths.max()) if len(lengths) > 0 else 0
+            matrix = np.full((len(sequences), max_len), padding_value, dtype=np.int32)
+            matrix[np.arange(max_len) < lengths[:, None]] = ids
+            return matrix, lengths
+
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        return ids, offsets
+
+    def get_projection(self, direction='phone2phoneme'):
+        """
+        projection matrix between phone ids and phoneme ids built from the allophone mapping.
+        for phone2phoneme, matrix[i, j] is 1 if the i-th phone is an allophone of the j-th phoneme
+
+        :param direction: 'phone2phoneme' or 'phoneme2phone'
+        :return: (|source unit|, |target unit|) float32 matrix
+        """
+
+        return self.build_projection(direction)[0]
+
+    def build_projection(self, direction):
+        """
+        build and cache the projection of a direction
+
+        :param direction: 'phone2phoneme' or 'phoneme2phone'
+        :return: (matrix, source ids ordered by target, start of each target in them, whether each target has a source)
+        """
+
+        if direction in self.projection:
+            return self.projection[direction]
+
+        import numpy as np
+
+        if direction == 'phone2phoneme':
+            source_unit, target_unit, mapping = self.phone, self.phoneme, self.phone2phoneme
+        else:
+            assert direction == 'phoneme2phone', f"unknown direction {direction}"
+            source_unit, target_unit, mapping = self.phoneme, self.phone, self.phoneme2phone
+
+        matrix = np.zeros((len(source_unit), len(target_unit)), dtype=np.float32)
+
+        for source, targets in mapping.items():
+            if source not in source_unit.unit_to_id:
+                continue
+
+            for target in targets:
+                if target in target_unit.unit_to_id:
+                    matrix[source_unit.unit_to_id[source], target_unit.unit_to_id[target]] = 1.0
+
+        # source ids grouped by target, used for max pooling
+        source_ids, target_ids = np.nonzero(matrix.T)[::-1]
+        counts = np.bincount(target_ids, minlength=len(target_unit))
+        starts = np.zeros(len(target_unit), dtype=np.int64)
+        np.cumsum(counts[:-1], out=starts[1:])
+
+        projection = (matrix, source_ids, starts, counts > 0)
+        self.projection[direction] = projection
+
+        return projection
+
+    def project_posterior(self, posteriors, direction='phone2phoneme', reduction='sum'):
+        """
+        aggregate posteriors over phones into posteriors over phonemes (or the other direction)
+
+        :param posteriors: ndarray of shape (..., |source unit|), e.g. (T, |phone|) or (B, T, |phone|)
+        :param direction: 'phone2phoneme' or 'phoneme2phone'
+        :param reduction: 'sum' or 'max' over the sources of each target
+        :return: ndarray of shape (..., |target unit|), targets without any source are 0
+        """
+
+        import numpy as np
+
+        matrix, source_ids, starts, has_source = self.build_projection(direction)
+
+        if reduction == 'sum':
+            return posteriors @ matrix.astype(posteriors.dtype, copy=False)
+
+        assert reduction == 'max', f"unknown reduction {reduction}"
+
+        result = np.zeros(posteriors.shape[:-1] + (matrix.shape[1],), dtype=posteriors.dtype)
+
+        if len(source_ids) == 0:
+            return result
+
+        # max over consecutive groups of gathered sources, empty groups are left as 0
+        gathered = posteriors[..., source_ids]
+        pooled = np.maximum.reduceat(gathered, starts[has_source], axis=-1)
+        result[..., has_source] = pooled
+
+        return result
+
     def phone_to_phoneme(self, phones):
         result = []
         for phone in phones:
@@ -301,22 +775,25 @@ class Inventory:
         :rtype: str
         """
 
-        if phone in self.phone_nearest_mapping:
-            nearest_phone = self.phone_nearest_mapping[phone]
-        elif phone in self.phone.unit_to_id:
-            self.phone_nearest_mapping[phone] = phone
-            nearest_phone = phone
-        elif phone.endswith('ː') and phone[:-1] in self.phone.unit_to_id:
-            # special handling for :
-            self.phone_nearest_mapping[phone] = phone[:-1]
-            nearest_phone = phone[:-1]
+        if verbose:
+            return self.compute_nearest_phone(phone, verbose)
 
-        else:
-            target_phones = list(self.phone.unit_to_id.keys())[1:-1]
-            nearest_phone = self.ipa.most_similar(phone, target_phones, verbose=verbose)
-            self.phone_nearest_mapping[phone] = nearest_phone
+        return self.phone_nearest_mapping.get_or_compute(phone, self.nearest_phone_compute, self.phone.is_unknown)
 
-        return nearest_phone
+    def compute_nearest_phone(self, phone, verbose=False):
+
+        if phone in self.phone.unit_to_id:
+            return phone
+
+        # special handling for :
+        if phone.endswith('ː') and phone[:-1] in self.phone.unit_to_id:
+            return phone[:-1]
+
+        if self.phone_remap_table is not None:
+            return self.lookup_remap_table(phone, self.phone_remap_table, self.phone)
+
+        target_phones = list(self.phone.unit_to_id.keys())[1:-1]
+        return self.ipa.most_similar(phone, target_phones, verbose=verbose)
 
     def get_nearest_phoneme(self, phoneme):
         """
@@ -329,23 +806,19 @@ class Inventory:
         :rtype: str
         """
 
-        if phoneme in self.nearest_mapping:
-            # check cache first
-            nearest_phoneme = self.nearest_mapping[phoneme]
+        return self.nearest_mapping.get_or_compute(phoneme, self.nearest_phoneme_compute, self.phoneme.is_unknown)
 
-        elif phoneme in self.phoneme.unit_to_id:
-            nearest_phoneme = phoneme
-            self.nearest_mapping[phoneme] = phoneme
+    def compute_nearest_phoneme(self, phoneme):
 
-        elif phoneme.endswith('ː') and phoneme[:-1] in self.phoneme.unit_to_id:
-            # special handling for :
-            self.nearest_mapping[phoneme] = phoneme[:-1]
-            nearest_phoneme = phoneme[:-1]
+        if phoneme in self.phoneme.unit_to_id:
+            return phoneme
 
-        else:
+        # special handling for :
+        if phoneme.endswith('ː') and phoneme[:-1] in self.phoneme.unit_to_id:
+            return phoneme[:-1]
 
-            target_phonemes = list(self.phoneme.unit_to_id.keys())[1:-1]
-            nearest_phoneme = self.ipa.most_similar(phoneme, target_phonemes)
-            self.nearest_mapping[phoneme] = nearest_phoneme
+        if self.phoneme_remap_table is not None:
+            return self.lookup_remap_table(phoneme, self.phoneme_remap_table, self.phoneme)
 
-        return nearest_phoneme
\ No newline at end of file
+        target_phonemes = list(self.phoneme.unit_to_id.keys())[1:-1]
+        return self.ipa.most_similar(phoneme, target_phonemes)
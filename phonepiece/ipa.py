@@ -1,8 +1,16 @@
 import numpy as np
-from phonepiece.config import PhonePieceConfig
+from phonepiece.config import PhonePieceConfig, find_cache_path
+from phonepiece.cache import BoundedCache
 import csv
 import unicodedata
-from collections import defaultdict
+import re
+import os
+import mmap
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from collections.abc import Mapping, Sequence
 
 _norm_rules = [
     (':', 'ː'),
@@ -30,15 +38,98 @@ _norm_rules = [
     ('˥', ''),
 ]
 
+# matches any symbol rewritten by _norm_rules.
+# rules feed into each other (e.g. ˈ deletion can create tʃ), so they are applied in order,
+# but symbols without any of these patterns are already in their rewritten form
+_norm_pattern = re.compile('|'.join(re.escape(rule[0]) for rule in _norm_rules))
+
+
+def apply_norm_rules(orig_phone):
+    """
+    NFD normalize the phone and fix some easy mistakes with _norm_rules
+
+    :param orig_phone: a phone or a phone sequence
+    :return: rewritten string
+    """
+
+    norm_phone = unicodedata.normalize('NFD', orig_phone)
+
+    if _norm_pattern.search(norm_phone) is None:
+        return norm_phone
+
+    for rule in _norm_rules:
+        norm_phone = norm_phone.replace(rule[0], rule[1])
+
+    return norm_phone
+
+
+# longest symbol considered by tokenize
+_max_phone_len = 8
+
+# weights are taken from panphon ipa_weights
+_ipa_weights = [
+   1,1,1,0.5,0.25,0.25,0.25,0.125,0.125,0.125,0.125,0.25,0.25,0.125,0.25,0.25,0.25,0.25,0.25,0.25,0.25,0.125,0,0
+]
+
+# version of the compiled ipa database, bump it whenever its layout or content changes
+_ipa_db_version = 3
+_ipa_db_magic = b'PPIPADB\0'
+
+# workers attach to the shared ipa database named by this environment variable, see share_ipa
+_ipa_shm_env = 'PHONEPIECE_IPA_SHM'
+
 # singleton
 ipa = None
 
+# path of the ipa database shared by this process, if any
+ipa_shm = None
+
 def read_ipa():
     global ipa
 
     if ipa is not None:
         return ipa
 
+    # attach to the database shared by the parent process
+    if os.environ.get(_ipa_shm_env):
+        ipa = attach_ipa(os.environ[_ipa_shm_env])
+
+        if ipa is not None:
+            return ipa
+
+    # load the compiled database if it is built from the current csv files,
+    # otherwise parse the csv files and compile them for the next process
+    source_hash = hash_ipa_source()
+    cache_path = find_cache_path()
+
+    if cache_path is None:
+        # nothing to compile into, e.g. read-only install without home directory: parse the csv files silently
+        PhonePieceConfig.logger.debug("no writable cache directory, the ipa database is not compiled")
+        ipa = build_ipa()
+
+    else:
+        db_path = cache_path / 'ipa.db'
+        ipa = load_ipa_db(db_path, source_hash)
+
+        if ipa is None:
+            ipa = build_ipa()
+
+            try:
+                write_ipa_db(ipa, db_path, source_hash)
+            except OSError as e:
+                PhonePieceConfig.logger.warning(f"could not write ipa database to {db_path}: {e}")
+
+    ipa.source_hash = source_hash
+    return ipa
+
+
+def build_ipa():
+    """
+    build IPA by parsing ipa_all.csv and ipa_base.csv
+
+    :return: IPA
+    """
+
     feature_file = PhonePieceConfig.data_path / f'ipa_all.csv'
 
     feature_map = {'0': 0, '-': -1, '+': 1}
@@ -55,14 +146,13 @@ def read_ipa():
             phone = unicodedata.normalize('NFD', row[0])
             features = list(map(lambda x: feature_map[x], row[1:]))
             assert len(features) == 24
-            phone2feature[phone] = np.array(features)
+            phone2feature[phone] = features
 
-    # weights are taken from panphon ipa_weights
-    weights = [
-       1,1,1,0.5,0.25,0.25,0.25,0.125,0.125,0.125,0.125,0.25,0.25,0.125,0.25,0.25,0.25,0.25,0.25,0.25,0.25,0.125,0,0
-    ]
+    # duplicated symbols keep the position of their first row and the features of their last row
+    phones = list(phone2feature.keys())
+    features = np.array(list(phone2feature.values()), dtype=np.int8)
 
-    assert len(weights) == 24
+    assert len(_ipa_weights) == 24
 
     base_phone_file = PhonePieceConfig.data_path / f'ipa_base.csv'
     base_phones = []
@@ -76,20 +166,424 @@ def read_ipa():
             phone = unicodedata.normalize('NFD', row[0])
             base_phones.append(phone)
 
-    ipa = IPA(phone2feature, weights, base_phones)
+    return IPA(phones, features, _ipa_weights, base_phones)
+
+
+def hash_ipa_source():
+    """
+    fingerprint of the csv files and the database version, used to invalidate the compiled database
+
+    :return: hex digest
+    """
+
+    sha = hashlib.sha1(str(_ipa_db_version).encode('utf-8'))
+
+    for name in ['ipa_all.csv', 'ipa_base.csv']:
+        sha.update((PhonePieceConfig.data_path / name).read_bytes())
+
+    return sha.hexdigest()
+
+
+def pack_ipa(ipa, source_hash):
+    """
+    serialize IPA into a single buffer.
+    the buffer is a magic, the length of a json header, the header and 64-byte aligned arrays
+
+    :param ipa: IPA
+    :param source_hash: fingerprint of the csv files
+    :return: bytes
+    """
+
+    # symbols are stored as utf-8 bytes with their offsets, and the rows in the sorted order of the symbols,
+    # so that processes mapping the database look symbols up without building their own dicts
+    encoded = [phone.encode('utf-8') for phone in ipa.phones]
+    symbol_offsets = np.zeros(len(encoded)+1, dtype=np.int32)
+    symbol_offsets[1:] = np.cumsum([len(symbol) for symbol in encoded])
+
+    arrays = {
+        'symbols': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'symbol_offsets': symbol_offsets,
+        'sorted_rows': np.array(sorted(range(len(encoded)), key=lambda i: ipa.phones[i]), dtype=np.int32),
+        'feature': np.ascontiguousarray(ipa.feature_matrix, dtype=np.int8),
+        'canonical': np.ascontiguousarray(ipa.canonical_index, dtype=np.int32),
+        'base': np.ascontiguousarray(ipa.get_base_index(), dtype=np.int32),
+    }
+
+    header = {
+        'version': _ipa_db_version,
+        'source': source_hash,
+        'base_phones': ipa.base_phones,
+        'weights': ipa.weights,
+        'arrays': {},
+    }
+
+    # array offsets are relative to the end of the header
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = [offset, array.dtype.str, list(array.shape)]
+        offset += (array.nbytes + 63) // 64 * 64
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_len = (len(header_bytes) + 16 + 63) // 64 * 64 - 16
+    header_bytes = header_bytes.ljust(header_len)
+
+    chunks = [_ipa_db_magic, header_len.to_bytes(8, 'little'), header_bytes]
+    for array in arrays.values():
+        data = array.tobytes()
+        chunks.append(data.ljust((len(data) + 63) // 64 * 64, b'\0'))
+
+    return b''.join(chunks)
+
+
+def unpack_ipa(buffer, source_hash=None):
+    """
+    deserialize IPA from a buffer created by pack_ipa. arrays are views of the buffer without copy
+
+    :param buffer: a bytes-like object (e.g. mmap)
+    :param source_hash: expected fingerprint, None to skip the check
+    :return: IPA or None if the buffer is outdated
+    """
+
+    if bytes(buffer[:8]) != _ipa_db_magic:
+        return None
+
+    header_len = int.from_bytes(buffer[8:16], 'little')
+    header = json.loads(bytes(buffer[16:16+header_len]).decode('utf-8'))
+
+    if header['version'] != _ipa_db_version:
+        return None
+
+    if source_hash is not None and header['source'] != source_hash:
+        return None
+
+    arrays = {}
+    for name, (offset, dtype, shape) in header['arrays'].items():
+        count = int(np.prod(shape))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=16+header_len+offset)
+        arrays[name] = array.reshape(shape)
+
+    phones = SymbolTable(arrays['symbols'], arrays['symbol_offsets'])
+    phone2idx = SymbolIndex(phones, arrays['sorted_rows'])
+
+    ipa = IPA(phones, arrays['feature'], header['weights'], header['base_phones'],
+              canonical_index=arrays['canonical'], base_index=arrays['base'], phone2idx=phone2idx)
+    ipa.source_hash = header['source']
+
     return ipa
 
 
+def load_ipa_db(db_path, source_hash):
+    """
+    memory-map the compiled ipa database
+
+    :param db_path: path to the database
+    :param source_hash: expected fingerprint of the csv files, None to skip the check
+    :return: IPA or None if it does not exist or is outdated
+    """
+
+    if not db_path.exists():
+        return None
+
+    try:
+        with open(db_path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return unpack_ipa(buffer, source_hash)
+
+    except (OSError, ValueError, KeyError) as e:
+        PhonePieceConfig.logger.warning(f"could not read ipa database {db_path}: {e}")
+        return None
+
+
+def write_ipa_db(ipa, db_path, source_hash):
+    """
+    compile IPA into db_path, the file is replaced atomically so that concurrent readers are safe
+
+    :param ipa: IPA
+    :param db_path: path to the database
+    :param source_hash: fingerprint of the csv files
+    """
+
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = db_path.parent / f'{db_path.name}.{os.getpid()}.tmp'
+    tmp_path.write_bytes(pack_ipa(ipa, source_hash))
+    os.replace(tmp_path, db_path)
+
+
+def share_ipa():
+    """
+    write the ipa database into a memory-backed file (/dev/shm if available), so that worker processes
+    memory-map it instead of loading their own copy: the feature matrix is then shared by all processes.
+    the path is exported through the PHONEPIECE_IPA_SHM environment variable, which is inherited by
+    workers started afterwards (fork or spawn). call unshare_ipa in the parent once the workers are done.
+
+    :return: path of the shared database
+    """
+
+    global ipa, ipa_shm
+
+    if ipa_shm is None:
+        shm_dir = Path('/dev/shm')
+        if not shm_dir.is_dir():
+            shm_dir = Path(tempfile.gettempdir())
+
+        fd, path = tempfile.mkstemp(prefix='phonepiece_ipa_', suffix='.db', dir=str(shm_dir))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pack_ipa(read_ipa(), hash_ipa_source()))
+
+        ipa_shm = path
+
+        # this process also switches to the shared copy
+        ipa = attach_ipa(path)
+
+    os.environ[_ipa_shm_env] = ipa_shm
+    return ipa_shm
+
+
+def attach_ipa(path):
+    """
+    attach to an ipa database shared by share_ipa. arrays are views of the shared mapping
+
+    :param path: path of the shared database
+    :return: IPA or None if it does not exist
+    """
+
+    if not Path(path).exists():
+        PhonePieceConfig.logger.warning(f"shared ipa database {path} does not exist")
+        return None
+
+    # the sharing process has already validated the database
+    return load_ipa_db(Path(path), None)
+
+
+def unshare_ipa():
+    """
+    remove the shared ipa database created by share_ipa.
+    workers which have attached to it keep their mapping, the ipa singleton of this process is
+    reloaded from the compiled database on the next read_ipa call
+    """
+
+    global ipa, ipa_shm
+
+    if ipa_shm is None:
+        return
+
+    if os.environ.get(_ipa_shm_env) == ipa_shm:
+        del os.environ[_ipa_shm_env]
+
+    path = ipa_shm
+    ipa = None
+    ipa_shm = None
+
+    try:
+        os.remove(path)
+    except OSError:
+        # windows does not remove mapped files
+        pass
+
+
+class SymbolTable(Sequence):
+
+    def __init__(self, data, offsets):
+        """
+        read-only list of symbols stored as utf-8 bytes (e.g. in the mapped ipa database), decoded on access
+
+        :param data: uint8 array of the concatenated symbols
+        :param offsets: int32 array, symbol i is data[offsets[i]:offsets[i+1]]
+        """
+
+        self.data = data
+        self.offsets = offsets
+
+        # memoryviews index and slice much faster than numpy scalars
+        self.data_view = memoryview(data)
+        self.offsets_view = memoryview(offsets)
+
+    def encoded(self, i):
+        # utf-8 bytes of symbol i
+        return bytes(self.data_view[self.offsets_view[i]:self.offsets_view[i+1]])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+
+        return self.encoded(i).decode('utf-8')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+
+class SymbolIndex(Mapping):
+
+    def __init__(self, phones, sorted_rows):
+        """
+        read-only mapping from symbol to its row, looked up by bisection over the sorted rows.
+        symbols which are found are memorized, so only the symbols used by this process are materialized
+
+        :param phones: SymbolTable
+        :param sorted_rows: int32 array, rows in the sorted order of their symbols
+        """
+
+        self.phones = phones
+        self.sorted_rows = sorted_rows
+        self.sorted_rows_view = memoryview(sorted_rows)
+        self.found = dict()
+
+    def __getitem__(self, phone):
+        row = self.found.get(phone)
+
+        if row is None:
+            # bisection over the sorted symbols, utf-8 bytes are in the same order as the symbols
+            key = phone.encode('utf-8')
+            rows = self.sorted_rows_view
+
+            lo, hi = 0, len(rows)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.phones.encoded(rows[mid]) < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+
+            if lo == len(rows) or self.phones.encoded(rows[lo]) != key:
+                raise KeyError(phone)
+
+            row = rows[lo]
+            self.found[phone] = row
+
+        return row
+
+    def __contains__(self, phone):
+        try:
+            self[phone]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        return iter(self.phones)
+
+    def __len__(self):
+        return len(self.phones)
+
+
+class CanonicalTable(Mapping):
+
+    def __init__(self, phones, phone2idx, canonical_index):
+        """
+        read-only mapping from symbol to its canonical symbol, see IPA.compute_canonical_form
+
+        :param phones: list of symbols
+        :param phone2idx: mapping from symbol to its row
+        :param canonical_index: row of the canonical symbol of each row
+        """
+
+        self.phones = phones
+        self.phone2idx = phone2idx
+        self.canonical_index = canonical_index
+
+    def __getitem__(self, phone):
+        return self.phones[int(self.canonical_index[self.phone2idx[phone]])]
+
+    def __contains__(self, phone):
+        return phone in self.phone2idx
+
+    def __iter__(self):
+        return iter(self.phones)
+
+    def __len__(self):
+        return len(self.phones)
+
+
+class FeatureTable(Mapping):
+
+    def __init__(self, phone2idx, features):
+        """
+        read-only mapping from phone to its feature.
+        features are returned as writable int64 copies of the compact (possibly memory-mapped) feature matrix
+
+        :param phone2idx: dict from phone to its row
+        :param features: feature matrix
+        """
+
+        self.phone2idx = phone2idx
+        self.features = features
+
+    def __getitem__(self, phone):
+        return self.features[self.phone2idx[phone]].astype(np.int64)
+
+    def __contains__(self, phone):
+        return phone in self.phone2idx
+
+    def __iter__(self):
+        return iter(self.phone2idx)
+
+    def __len__(self):
+        return len(self.phone2idx)
+
+
 class IPA:
 
-    def __init__(self, phone2feature, weights, base_phones):
-        self.phone2feature = phone2feature
+    def __init__(self, phones, features, weights, base_phones, canonical_index=None, base_index=None, phone2idx=None):
+        """
+        IPA manages the articulatory features of all ipa symbols.
+        features are stored as a dense matrix whose i-th row is the feature of phones[i]
+
+        :param phones: list of NFD normalized ipa symbols
+        :param features: (len(phones), 24) feature matrix
+        :param weights: weight of each feature
+        :param base_phones: list of base phones
+        :param canonical_index: row of the canonical phone of each row, computed if not provided
+        :param base_index: position in base_phones of the base phone of each row, computed on demand if not provided
+        :param phone2idx: mapping from phone to its row (e.g. SymbolIndex), a dict is built if not provided
+        """
+
+        self.phones = phones
+        self.phone2idx = {phone: i for i, phone in enumerate(phones)} if phone2idx is None else phone2idx
+        self.feature_matrix = features
+        self.phone2feature = FeatureTable(self.phone2idx, features)
+
         self.weights = weights
+        self.weight_vector = np.array(weights, dtype=np.float64)
         self.base_phones = sorted(base_phones)
         self.base_phones_set = set(base_phones)
 
-        self.canonical_phone = {}
-        self.compute_canonical_form()
+        # lru cache of candidate lists -> (positions of valid candidates, their feature rows)
+        self.candidate_index = BoundedCache(PhonePieceConfig.candidate_cache_size, 'ipa candidates', lru=True)
+
+        # prefix trie of all symbols, built on the first tokenize call
+        self.trie = None
+
+        # one-hot encoding of the feature matrix, built on the first nearest_phones call
+        self.feature_index = None
+
+        # base phone of every row, see build_base_index
+        self.base_index = base_index
+
+        # fingerprint of the csv files this IPA is built from, used to validate derived tables
+        self.source_hash = None
+
+        # memo of normalize, oldest entries are dropped when it is full
+        self.normalize_cache = BoundedCache(PhonePieceConfig.normalize_cache_size, 'ipa normalize')
+
+        if canonical_index is None:
+            self.compute_canonical_form()
+        else:
+            self.canonical_index = canonical_index
+            self.canonical_phone = CanonicalTable(phones, self.phone2idx, canonical_index)
 
     def __getitem__(self, item):
         item = self.normalize(item)
@@ -107,48 +601,75 @@ class IPA:
         return self.__getitem__(item)
 
     def compute_canonical_form(self):
-        phone_idx = defaultdict(list)
+        """
+        group phones sharing the same feature hash and map every phone to one canonical phone per group.
+        the canonical phone is the first base phone of the group, otherwise the first phone of min length
+        """
 
-        power = np.array([2**i for i in range(24)])
-        for phone, feat in self.phone2feature.items():
-            idx = np.sum((feat + 2)*power)
-            phone_idx[idx].append(phone)
+        num_phone = len(self.phones)
 
-        for _, phones in phone_idx.items():
-            if len(phones) == 1:
-                self.canonical_phone[phones[0]] = phones[0]
-            else:
-                canonical_form = None
+        power = 2 ** np.arange(24, dtype=np.int64)
+        phone_hash = (self.feature_matrix.astype(np.int64) + 2) @ power
+        _, group = np.unique(phone_hash, return_inverse=True)
+        group = group.reshape(-1)
 
-                # identify the canoncial form by
-                # checking whether it is in the base phones
-                # otherwise pick up the min length phone
-                min_length = 100
-                min_phone = None
+        # rank phones in each group: base phones first, then shorter phones, then the row order
+        rows = np.arange(num_phone)
+        is_base = np.array([phone in self.base_phones_set for phone in self.phones], dtype=bool)
+        length = np.array([len(phone) for phone in self.phones], dtype=np.int64)
+        length[is_base] = 0
 
-                for phone in phones:
-                    if phone in self.base_phones_set:
-                        canonical_form = phone
-                        break
-                    else:
-                        if len(phone) < min_length:
-                            min_length = len(phone)
-                            min_phone = phone
+        order = np.lexsort((rows, length, ~is_base, group))
 
+        # the first phone of each group in the ranked order is its canonical phone
+        sorted_group = group[order]
+        is_first = np.ones(num_phone, dtype=bool)
+        is_first[1:] = sorted_group[1:] != sorted_group[:-1]
 
-                if canonical_form is None:
-                    canonical_form = min_phone
+        group2canonical = np.empty(group.max() + 1 if num_phone > 0 else 0, dtype=np.int32)
+        group2canonical[sorted_group[is_first]] = order[is_first]
 
-                assert canonical_form is not None
-                for phone in phones:
-                    self.canonical_phone[phone] = canonical_form
+        self.canonical_index = group2canonical[group]
+        self.canonical_phone = {phone: self.phones[idx] for phone, idx in zip(self.phones, self.canonical_index.tolist())}
 
     def normalize(self, orig_phone):
-        norm_phone = unicodedata.normalize('NFD', orig_phone)
+
+        phone = self.normalize_cache.get_or_compute(orig_phone, self._normalize, self.is_unknown)
+
+        # failures are cached as well, but reported on every call
+        if phone == '':
+            PhonePieceConfig.logger.error(f"cannot normalize phone {orig_phone}")
+
+        return phone
+
+    def is_unknown(self, orig_phone):
+        """
+        whether orig_phone cannot be normalized, without reporting it as normalize does
+
+        :param orig_phone: a random phone
+        :return: bool
+        """
+
+        phone = self.normalize_cache.get(orig_phone)
+
+        if phone is None:
+            phone = self._normalize(orig_phone)
+
+        return phone == ''
+
+    def get_stats(self):
+        """
+        statistics of the normalize cache, see phonepiece.cache.CacheStats
+
+        :return: dict
+        """
+
+        return {'normalize': self.normalize_cache.stats.to_dict()}
+
+    def _normalize(self, orig_phone):
 
         # normalize some easy mistakes
-        for rule in _norm_rules:
-            norm_phone = norm_phone.replace(rule[0], rule[1])
+        norm_phone = apply_norm_rules(orig_phone)
 
         phone = norm_phone
         # strip diacritics until it find match
@@ -166,37 +687,88 @@ class IPA:
             return self.canonical_phone[norm_phone[1:-1]]
 
         # give up ... and return empty as an invalid phone to debug
-        PhonePieceConfig.logger.error(f"cannot normalize phone {orig_phone}")
         return ''
 
-    def tokenize(self, orig_phone):
+    def build_trie(self):
+        """
+        build a prefix trie over all symbols.
+        each node is a dict from the next char to its child,
+        a node ending a symbol stores the NFC form of the symbol under the '' key
+
+        :return: root of the trie
+        """
 
-        norm_phone = unicodedata.normalize('NFD', orig_phone)
+        trie = dict()
+
+        for phone in self.phones:
+            node = trie
+            for char in phone:
+                node = node.setdefault(char, dict())
+            node[''] = unicodedata.normalize('NFC', phone)
+
+        self.trie = trie
+        return trie
+
+    def tokenize(self, orig_phone):
 
         # normalize some easy mistakes
-        for rule in _norm_rules:
-            norm_phone = norm_phone.replace(rule[0], rule[1])
+        phone = apply_norm_rules(orig_phone)
 
-        phone = norm_phone
+        trie = self.trie
+        if trie is None:
+            trie = self.build_trie()
 
         res = []
         i = 0
-        while i < len(phone):
-            longest_len = -1
+        phone_len = len(phone)
+
+        while i < phone_len:
+
+            # walk down the trie to find the longest symbol starting at i
+            node = trie
+            longest_end = -1
+            subphone = None
+
+            j = i
+            end = min(i + _max_phone_len, phone_len)
+
+            while j < end:
+                node = node.get(phone[j])
+                if node is None:
+                    break
 
-            for j in range(1, min(8, len(phone) - i)+1):
-                if phone[i:i+j] in self.phone2feature:
-                    longest_len = j
+                j += 1
+                if '' in node:
+                    longest_end = j
+                    subphone = node['']
 
-            if longest_len != -1:
-                subphone = phone[i:i+longest_len]
-                res.append(unicodedata.normalize('NFC', subphone))
-                i += len(subphone)
+            if longest_end != -1:
+                res.append(subphone)
+                i = longest_end
             else:
                 i += 1
 
         return res
 
+    def tokenize_batch(self, orig_phones):
+        """
+        tokenize a list of strings, each distinct string is only tokenized once
+
+        :param orig_phones: list of strings (e.g. lines of a corpus)
+        :return: list of tokenized phone lists
+        """
+
+        tokenized = dict()
+        res = []
+
+        for orig_phone in orig_phones:
+            if orig_phone not in tokenized:
+                tokenized[orig_phone] = self.tokenize(orig_phone)
+
+            res.append(list(tokenized[orig_phone]))
+
+        return res
+
     def similarity(self, p1, p2):
         """
         similarity between phone 1 and phone 2
@@ -222,11 +794,90 @@ class IPA:
     def distance(self, p1, p2):
         return 1.0 - self.similarity(p1, p2)
 
+    def phone_rows(self, phones):
+        """
+        rows of phones in the feature matrix, each distinct phone is normalized once
 
-    def most_similar(self, target_phone, phone_cands, verbose=False):
+        :param phones: list of phones
+        :return: int64 array, -1 for phones which cannot be normalized
+        """
+
+        phone2row = dict()
+
+        for phone in phones:
+            if phone not in phone2row:
+                phone2row[phone] = self.phone2idx.get(self.normalize(phone), -1)
+
+        return np.array([phone2row[phone] for phone in phones], dtype=np.int64)
+
+    def distance_matrix(self, phones_a, phones_b):
+        """
+        pairwise distances between two phone lists, equivalent to calling IPA.distance on every pair
+
+        :param phones_a: list of phones
+        :param phones_b: list of phones
+        :return: (len(phones_a), len(phones_b)) float64 array
+        """
+
+        feature_index = self.feature_index
+        if feature_index is None:
+            feature_index = self.build_feature_index()
+
+        rows_a = self.phone_rows(phones_a)
+        rows_b = self.phone_rows(phones_b)
+
+        # distance is 1 if either phone is not found
+        distances = np.ones((len(rows_a), len(rows_b)), dtype=np.float64)
+
+        valid_a = np.flatnonzero(rows_a >= 0)
+        valid_b = np.flatnonzero(rows_b >= 0)
+
+        if len(valid_a) == 0 or len(valid_b) == 0:
+            return distances
+
+        # weighted L1 distances of all valid pairs in one product
+        weighted = (self.feature_costs(rows_a[valid_a]) @ feature_index[rows_b[valid_b]].T).astype(np.float64)
+
+        # same arithmetic as IPA.similarity and IPA.distance
+        similarity = 1.0 - weighted / np.sum(self.weights) / 2.0
+        distances[np.ix_(valid_a, valid_b)] = 1.0 - similarity
+
+        return distances
+
+
+    def index_candidates(self, phone_cands):
+        """
+        normalize candidates and look up their rows in the feature matrix.
+        candidates which cannot be normalized are skipped.
+        the result is cached, as the same candidate list (e.g. an inventory) is usually queried many times
+
+        :param phone_cands: list of candidate phones
+        :return: positions of valid candidates in phone_cands and their rows in the feature matrix
+        """
+
+        return self.candidate_index.get_or_compute(tuple(phone_cands), self.build_candidate_index)
+
+    def build_candidate_index(self, phone_cands):
+        """
+        the uncached index_candidates
 
-        max_phone = phone_cands[0]
-        min_distance = 1000000
+        :param phone_cands: tuple of candidate phones
+        :return: positions of valid candidates in phone_cands and their rows in the feature matrix
+        """
+
+        positions = []
+        rows = []
+
+        for i, orig_phone in enumerate(phone_cands):
+            phone = self.normalize(orig_phone)
+
+            if phone in self.phone2idx:
+                positions.append(i)
+                rows.append(self.phone2idx[phone])
+
+        return np.array(positions, dtype=np.int64), np.array(rows, dtype=np.int64)
+
+    def most_similar(self, target_phone, phone_cands, verbose=False):
 
         if target_phone in phone_cands:
             return target_phone
@@ -234,23 +885,183 @@ class IPA:
         target_phone = self.normalize(target_phone)
 
         # if feature not found, then just use the first phone_cand
-        if target_phone not in self.phone2feature:
+        if target_phone not in self.phone2idx:
             return phone_cands[0]
 
-        target_feature = self.phone2feature[target_phone]
-
-        for orig_phone in phone_cands:
-            phone = self.normalize(orig_phone)
+        positions, rows = self.index_candidates(phone_cands)
 
-            if phone in self.phone2feature:
-                cand_feature = self.phone2feature[phone]
-                distance = np.sum(np.abs(target_feature-cand_feature) * self.weights)
+        # no candidate has a valid feature
+        if len(rows) == 0:
+            return phone_cands[0]
 
-                if distance < min_distance:
-                    max_phone = orig_phone
-                    min_distance = distance
+        target_feature = self.feature_matrix[self.phone2idx[target_phone]]
+        distances = np.abs(self.feature_matrix[rows] - target_feature) @ self.weight_vector
 
-        return max_phone
+        # argmin returns the first minimum, which is the same tie-breaking as scanning candidates in order
+        return phone_cands[positions[np.argmin(distances)]]
 
     def compute_base_phone(self, target_phone):
-        return self.most_similar(target_phone, self.base_phones)
\ No newline at end of file
+
+        if target_phone in self.base_phones_set:
+            return target_phone
+
+        row = self.phone2idx.get(self.normalize(target_phone))
+
+        # if feature not found, then just use the first base phone
+        if row is None:
+            return self.base_phones[0]
+
+        return self.base_phones[self.get_base_index()[row]]
+
+    def compute_base_phones(self, target_phones):
+        """
+        base phone of each phone in target_phones, equivalent to calling compute_base_phone on each phone
+
+        :param target_phones: list of phones
+        :return: list of base phones
+        """
+
+        base_index = self.get_base_index()
+        rows = self.phone_rows(target_phones).tolist()
+
+        res = []
+
+        for phone, row in zip(target_phones, rows):
+            if phone in self.base_phones_set:
+                res.append(phone)
+            elif row < 0:
+                res.append(self.base_phones[0])
+            else:
+                res.append(self.base_phones[base_index[row]])
+
+        return res
+
+    def get_base_index(self):
+        if self.base_index is None:
+            self.build_base_index()
+
+        return self.base_index
+
+    def build_base_index(self):
+        """
+        project every ipa symbol to its nearest base phone in one product, so that compute_base_phone
+        is a lookup. the result is the same as most_similar(phone, base_phones) on the canonical phone of each row.
+        it is stored in the compiled ipa database, see pack_ipa
+
+        :return: int32 array, position in base_phones of the base phone of each row
+        """
+
+        feature_index = self.feature_index
+        if feature_index is None:
+            feature_index = self.build_feature_index()
+
+        positions, rows = self.index_candidates(self.base_phones)
+
+        # no base phone has a valid feature, most_similar falls back to the first one
+        if len(rows) == 0:
+            self.base_index = np.zeros(len(self.phones), dtype=np.int32)
+            return self.base_index
+
+        # weights are multiples of 1/8, so float32 distances are exact and ties are broken as in most_similar
+        distances = self.feature_costs(self.canonical_index) @ feature_index[rows].T
+
+        self.base_index = positions[np.argmin(distances, axis=1)].astype(np.int32)
+        return self.base_index
+
+    def build_feature_index(self):
+        """
+        build the one-hot encoding of the feature matrix: each ternary feature becomes 3 columns.
+        the weighted L1 distance to any phone is then a single product with its feature costs.
+        each row encodes the feature of its canonical phone, as symbols are compared by canonical forms
+
+        :return: (len(phones), 72) float32 matrix
+        """
+
+        num_phone, num_feature = self.feature_matrix.shape
+
+        feature_index = np.zeros((num_phone, num_feature * 3), dtype=np.float32)
+        cols = np.arange(num_feature) * 3 + self.feature_matrix[self.canonical_index] + 1
+        feature_index[np.arange(num_phone)[:, None], cols] = 1.0
+
+        self.feature_index = feature_index
+        return feature_index
+
+    def feature_costs(self, rows):
+        """
+        weighted cost of every feature value against the phones of rows.
+        costs[q, f*3+v+1] is the weight of feature f times |feature(q)[f] - v|
+
+        :param rows: rows of the query phones
+        :return: (len(rows), 72) float32 matrix
+        """
+
+        values = np.array([-1, 0, 1])
+        costs = np.abs(self.feature_matrix[rows][:, :, None] - values) * self.weight_vector[:, None]
+        return costs.reshape(len(rows), -1).astype(np.float32)
+
+    def nearest_phones(self, target_phone, k=5, phone_cands=None):
+        """
+        exact top-k nearest phones of target_phone
+
+        :param target_phone: a random phone
+        :param k: number of phones to return
+        :param phone_cands: candidate phones (e.g. an inventory), all ipa symbols if None
+        :return: list of (phone, distance) sorted by distance, ties are sorted by the candidate order.
+                 distance is in the same scale as IPA.distance, empty if target_phone cannot be normalized
+        """
+
+        return self.nearest_phones_batch([target_phone], k, phone_cands)[0]
+
+    def nearest_phones_batch(self, target_phones, k=5, phone_cands=None):
+        """
+        exact top-k nearest phones of each phone in target_phones, see nearest_phones
+
+        :param target_phones: list of phones
+        :param k: number of phones to return per target
+        :param phone_cands: candidate phones (e.g. an inventory), all ipa symbols if None
+        :return: list of (phone, distance) lists
+        """
+
+        feature_index = self.feature_index
+        if feature_index is None:
+            feature_index = self.build_feature_index()
+
+        if phone_cands is None:
+            cand_phones = self.phones
+            cand_index = feature_index
+        else:
+            positions, rows = self.index_candidates(phone_cands)
+            cand_phones = [phone_cands[i] for i in positions.tolist()]
+            cand_index = feature_index[rows]
+
+        target_rows = self.phone_rows(target_phones).tolist()
+        valid = [i for i, row in enumerate(target_rows) if row >= 0]
+
+        res = [[] for _ in target_phones]
+
+        k = min(k, len(cand_phones))
+        if len(valid) == 0 or k <= 0:
+            return res
+
+        # (num_target, num_cand) weighted L1 distances in one product
+        costs = self.feature_costs(np.array([target_rows[i] for i in valid]))
+        distances = costs @ cand_index.T
+
+        # weights are multiples of 1/8, so scaled distances are exact integers.
+        # packing the candidate position into the key makes top-k selection deterministic on ties
+        num_cand = len(cand_phones)
+        keys = np.rint(distances * 8).astype(np.int64) * num_cand + np.arange(num_cand)
+
+        if k < num_cand:
+            top = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(num_cand), (len(valid), 1))
+
+        top = np.take_along_axis(top, np.argsort(np.take_along_axis(keys, top, axis=1), axis=1), axis=1)
+        top_distances = np.take_along_axis(distances, top, axis=1).astype(np.float64)
+        top_distances = 1.0 - (1.0 - top_distances / np.sum(self.weight_vector) / 2.0)
+
+        for i, cand_rows, cand_distances in zip(valid, top.tolist(), top_distances.tolist()):
+            res[i] = [(cand_phones[row], distance) for row, distance in zip(cand_rows, cand_distances)]
+
+        return res
\ No newline at end of file
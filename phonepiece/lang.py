@@ -1,4 +1,3 @@
-from iso639 import languages
 import re
 import json
 from pathlib import Path
@@ -31,6 +30,9 @@ def normalize_lang_id(lang_id):
 
     assert len(lang_id) == 2
 
+    # iso639 is only needed for 2 char ids, import it lazily to keep startup fast
+    from iso639 import languages
+
     language = languages.get(part1=lang_id)
     iso3 = language.part3
     if iso3 in _macro_to_individual:
@@ -38,6 +40,8 @@ def normalize_lang_id(lang_id):
     return iso3
 
 def read_lang_name(lang_id):
+    from iso639 import languages
+
     lang_id = normalize_lang_id(lang_id)
     language = languages.get(part3=lang_id)
     return language.name
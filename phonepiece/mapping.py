@@ -0,0 +1,157 @@
+from phonepiece.config import PhonePieceConfig
+from phonepiece.cache import BoundedCache
+import numpy as np
+
+
+# process-wide cache of mappings: (fingerprints of both inventories, unit, ipa source) -> InventoryMapping
+_mapping_cache = BoundedCache(lambda: PhonePieceConfig.mapping_cache_size, 'inventory mappings', lru=True)
+
+
+def read_inventory_mapping(inv_a, inv_b, unit='phoneme'):
+    """
+    map the units of inv_a onto inv_b and the units of inv_b onto inv_a.
+    mappings are cached process-wide by the content fingerprints of the pair, so the same pair of
+    languages is computed once even when their inventories are reloaded
+
+    :param inv_a: Inventory
+    :param inv_b: Inventory
+    :param unit: 'phoneme' or 'phone'
+    :return: InventoryMapping
+    """
+
+    key = (inv_a.fingerprint(), inv_b.fingerprint(), unit, inv_a.ipa.source_hash)
+
+    return _mapping_cache.get_or_compute(key, lambda key: InventoryMapping(inv_a, inv_b, unit))
+
+
+def read_inventory_mappings(inventories, unit='phoneme'):
+    """
+    map every pair of inventories
+
+    :param inventories: dict of lang_id -> Inventory (e.g. from read_inventories)
+    :param unit: 'phoneme' or 'phone'
+    :return: dict of (lang_id_a, lang_id_b) -> InventoryMapping, lang_id_a < lang_id_b
+    """
+
+    lang_ids = sorted(inventories)
+
+    mappings = dict()
+
+    for i, lang_a in enumerate(lang_ids):
+        for lang_b in lang_ids[i+1:]:
+            mappings[(lang_a, lang_b)] = read_inventory_mapping(inventories[lang_a], inventories[lang_b], unit)
+
+    return mappings
+
+
+def clear_mapping_cache():
+    _mapping_cache.clear()
+
+
+def compute_nearest_ids(distances, units_a, units_b, valid_a, valid_b):
+    """
+    nearest unit in units_b of each unit in units_a, the same decision as Inventory.get_nearest_phoneme
+
+    :param distances: (len(units_a), len(units_b)) distance matrix
+    :param units_a: list of units
+    :param units_b: list of units
+    :param valid_a: whether each unit in units_a has an ipa feature
+    :param valid_b: whether each unit in units_b has an ipa feature
+    :return: int64 array of positions in units_b
+    """
+
+    # ipa.most_similar skips candidates without feature, and picks the first candidate on ties
+    nearest = np.argmin(np.where(valid_b, distances, np.inf), axis=1)
+
+    # units without feature fall back to the first candidate
+    nearest[~valid_a] = 0
+
+    unit2pos = {unit: i for i, unit in enumerate(units_b)}
+
+    for i, unit in enumerate(units_a):
+        if unit in unit2pos:
+            nearest[i] = unit2pos[unit]
+        elif unit.endswith('ː') and unit[:-1] in unit2pos:
+            # special handling for :
+            nearest[i] = unit2pos[unit[:-1]]
+
+    return nearest
+
+
+class InventoryMapping:
+
+    def __init__(self, inv_a, inv_b, unit='phoneme'):
+        """
+        articulatory mapping between the units of two inventories, computed in one product
+
+        similarity[i, j] is ipa.similarity(units_a[i], units_b[j]).
+        a2b and b2a map unit ids of one inventory to unit ids of the other, <blk> and <eos> are mapped to themselves,
+        so they can be applied directly to id arrays: a2b[ids]
+
+        :param inv_a: Inventory
+        :param inv_b: Inventory
+        :param unit: 'phoneme' or 'phone'
+        """
+
+        assert unit in ['phoneme', 'phone']
+
+        self.lang_a = inv_a.lang_id
+        self.lang_b = inv_b.lang_id
+        self.unit = unit
+
+        ipa = inv_a.ipa
+
+        unit_a = getattr(inv_a, unit)
+        unit_b = getattr(inv_b, unit)
+
+        self.units_a = unit_a.elems[1:-1]
+        self.units_b = unit_b.elems[1:-1]
+
+        distances = ipa.distance_matrix(self.units_a, self.units_b)
+        self.similarity = 1.0 - distances
+
+        if len(self.units_a) == 0 or len(self.units_b) == 0:
+            self.a2b = np.arange(len(unit_a.elems))
+            self.b2a = np.arange(len(unit_b.elems))
+            return
+
+        valid_a = ipa.phone_rows(self.units_a) >= 0
+        valid_b = ipa.phone_rows(self.units_b) >= 0
+
+        a2b = compute_nearest_ids(distances, self.units_a, self.units_b, valid_a, valid_b)
+        b2a = compute_nearest_ids(distances.T, self.units_b, self.units_a, valid_b, valid_a)
+
+        self.a2b = self.expand_ids(a2b, unit_b)
+        self.b2a = self.expand_ids(b2a, unit_a)
+
+    def expand_ids(self, nearest, unit):
+        # positions -> unit ids, with <blk> and <eos> mapped to themselves
+        return np.concatenate([[0], nearest + 1, [len(unit.elems) - 1]]).astype(np.int64)
+
+    def __str__(self):
+        return f"<InventoryMapping {self.lang_a} <-> {self.lang_b} {self.unit}: {len(self.units_a)} x {len(self.units_b)}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def map_a2b(self, units):
+        """
+        map units of inventory a to their nearest units in inventory b
+
+        :param units: list of units in inventory a
+        :return: list of units in inventory b
+        """
+
+        unit2pos = {unit: i for i, unit in enumerate(self.units_a)}
+        return [self.units_b[self.a2b[unit2pos[unit] + 1] - 1] for unit in units]
+
+    def map_b2a(self, units):
+        """
+        map units of inventory b to their nearest units in inventory a
+
+        :param units: list of units in inventory b
+        :return: list of units in inventory a
+        """
+
+        unit2pos = {unit: i for i, unit in enumerate(self.units_b)}
+        return [self.units_a[self.b2a[unit2pos[unit] + 1] - 1] for unit in units]
@@ -1,18 +1,28 @@
-import numpy as np
-from phonepiece.ipa import read_ipa
+from phonepiece.cache import RemapCache
+
+
+# max number of units in a joint id, each unit takes 3 decimal digits of an int64
+_max_joint_len = 6
 
 
 def read_unit(unit_path):
     # load unit from units.txt
     # units.txt should start from index 1 (because ctc blank is taking the 0 index)
 
+    with open(str(unit_path), 'r', encoding='utf-8') as f:
+        return parse_unit(f)
+
+
+def parse_unit(lines):
+    # parse unit from lines of units.txt
+
     unit_to_id = dict()
 
     unit_to_id['<blk>'] = 0
 
     idx = 0
 
-    for line in open(str(unit_path), 'r', encoding='utf-8'):
+    for line in lines:
         fields = line.strip().split()
 
         assert len(fields) < 3
@@ -91,8 +101,34 @@ class Unit:
             self.id_to_unit[idx] = unit
             self.elems[idx] = unit
 
-        self.ipa = read_ipa()
-        self.nearest_mapping = None
+        # lookup tables used by atoi/itoa, ' ' and '<space>' are mapped to each other
+        self.atoi_table = dict(self.unit_to_id)
+        if '<space>' in self.unit_to_id:
+            self.atoi_table[' '] = self.unit_to_id['<space>']
+
+        self.itoa_table = {idx: ' ' if unit == '<space>' else unit for idx, unit in self.id_to_unit.items()}
+
+        # array form of itoa_table, built on the first ndarray input
+        self.elem_array = None
+        self.elem_mask = None
+
+        # ipa is loaded on first use
+        self._ipa = None
+        self.nearest_mapping = RemapCache(name='unit nearest phoneme')
+
+    @property
+    def ipa(self):
+        if self._ipa is None:
+            from phonepiece.ipa import read_ipa
+            self._ipa = read_ipa()
+
+        return self._ipa
+
+    def __getstate__(self):
+        # the ipa singleton may be memory-mapped, it is read again in the unpickled process
+        state = self.__dict__.copy()
+        state['_ipa'] = None
+        return state
 
     def __str__(self):
         return '<Unit: ' + str(len(self.unit_to_id)) + ' elems: ' + str(self.unit_to_id)+ '>'
@@ -129,6 +165,8 @@ class Unit:
     def atoi(self, inputs):
         if isinstance(inputs, list):
             return self.get_ids(inputs)
+        elif type(inputs).__module__ == 'numpy' and getattr(inputs, 'ndim', 0) > 0:
+            return self.get_id_array(inputs)
         else:
             return self.get_id(inputs)
 
@@ -136,6 +174,8 @@ class Unit:
     def itoa(self, inputs):
         if isinstance(inputs, list):
             return self.get_units(inputs)
+        elif type(inputs).__module__ == 'numpy' and getattr(inputs, 'ndim', 0) > 0:
+            return self.get_unit_array(inputs)
         else:
             return self.get_unit(inputs)
 
@@ -156,7 +196,24 @@ class Unit:
         :return:
         """
 
-        return [self.get_id(unit) for unit in units]
+        try:
+            return list(map(self.atoi_table.__getitem__, units))
+        except KeyError:
+            missing = sorted(set(unit for unit in units if unit not in self.atoi_table))
+            raise AssertionError(f"units {missing} are not in the unit ({len(self)} elems)")
+
+    def get_id_array(self, units):
+        """
+        get index for an ndarray of units
+
+        :param units: ndarray of str
+        :return: int64 ndarray of the same shape
+        """
+
+        import numpy as np
+
+        ids = self.get_ids(units.ravel().tolist())
+        return np.array(ids, dtype=np.int64).reshape(units.shape)
 
     def get_unit(self, id):
         assert id >= 0 and id in self.id_to_unit, f"{id} not in the unit {self.id_to_unit}"
@@ -177,7 +234,65 @@ class Unit:
         :return: a list of unit
         """
 
-        return [self.get_unit(id) for id in ids]
+        try:
+            return list(map(self.itoa_table.__getitem__, ids))
+        except KeyError:
+            invalid = sorted(set(id for id in ids if id not in self.itoa_table))
+            raise AssertionError(f"ids {invalid} are not in the unit ({len(self)} elems)")
+
+    def get_unit_array(self, ids):
+        """
+        get unit from an ndarray of ids with a single gather
+
+        :param ids: int ndarray
+        :return: ndarray of units (object dtype) of the same shape
+        """
+
+        import numpy as np
+
+        ids = np.asarray(ids)
+        self.check_id_array(ids)
+
+        return self.elem_array[ids]
+
+    def build_elem_array(self):
+        """
+        build the array form of itoa_table and a mask of valid ids
+        """
+
+        import numpy as np
+
+        size = max(self.itoa_table) + 1
+        self.elem_array = np.empty(size, dtype=object)
+        self.elem_mask = np.zeros(size, dtype=bool)
+
+        for idx, unit in self.itoa_table.items():
+            self.elem_array[idx] = unit
+            self.elem_mask[idx] = True
+
+    def is_valid_id(self, ids):
+        """
+        check whether each id in an int ndarray is an id of this unit
+
+        :param ids: int ndarray
+        :return: bool ndarray of the same shape
+        """
+
+        if self.elem_array is None:
+            self.build_elem_array()
+
+        valid = (ids >= 0) & (ids < len(self.elem_array))
+        valid[valid] = self.elem_mask[ids[valid]]
+
+        return valid
+
+    def check_id_array(self, ids):
+        import numpy as np
+
+        valid = self.is_valid_id(ids)
+
+        if not valid.all():
+            raise AssertionError(f"ids {np.unique(ids[~valid]).tolist()} are not in the unit ({len(self)} elems)")
 
     def get_joint_id(self, unit):
 
@@ -227,29 +342,108 @@ class Unit:
 
         return phones
 
+    def pack_joint(self, ids, offsets):
+        """
+        pack groups of unit ids into joint ids, the batch version of get_joint_id.
+        the i-th group is ids[offsets[i]:offsets[i+1]], a group of a single unit is packed into its own id
+
+        :param ids: int ndarray of unit ids
+        :param offsets: int ndarray of group offsets, starting from 0
+        :return: int64 ndarray of joint ids
+        """
+
+        import numpy as np
+
+        ids = np.asarray(ids, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(offsets)
+
+        if len(lengths) > 0 and lengths.max() > _max_joint_len:
+            raise OverflowError(f"groups {np.flatnonzero(lengths > _max_joint_len).tolist()} have more than {_max_joint_len} units")
+
+        group = np.repeat(np.arange(len(lengths)), lengths)
+
+        # each unit of a combined group takes 3 decimal digits, int64 holds at most _max_joint_len of them.
+        # a single unit is kept as is, as in get_joint_id
+        invalid = (ids < 0) | ((ids >= 1000) & (lengths[group] > 1))
+        if invalid.any():
+            raise OverflowError(f"ids {np.unique(ids[invalid]).tolist()} cannot be packed into joint ids")
+
+        exponent = offsets[1:][group] - 1 - np.arange(len(ids))
+
+        joint_ids = np.zeros(len(lengths), dtype=np.int64)
+        np.add.at(joint_ids, group, ids * 1000 ** exponent)
+
+        return joint_ids
+
+    def unpack_joint(self, joint_ids, as_ids=False):
+        """
+        unpack joint ids into their units, the batch version of get_joint_unit
+
+        :param joint_ids: int ndarray of joint ids
+        :param as_ids: return unit ids instead of units
+        :return: (units, offsets) where units is a flattened ndarray and the i-th joint id is
+                 units[offsets[i]:offsets[i+1]]
+        """
+
+        import numpy as np
+
+        joint_ids = np.asarray(joint_ids, dtype=np.int64).ravel()
+
+        # ids of the unit itself are not unpacked
+        is_unit = self.is_valid_id(joint_ids)
+
+        # count the 3-digit groups of the other ids
+        lengths = np.zeros(len(joint_ids), dtype=np.int64)
+        remain = joint_ids.copy()
+        for _ in range(_max_joint_len + 1):
+            lengths += remain > 0
+            remain //= 1000
+
+        lengths[is_unit] = 1
+
+        offsets = np.zeros(len(joint_ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        group = np.repeat(np.arange(len(joint_ids)), lengths)
+        exponent = offsets[1:][group] - 1 - np.arange(offsets[-1])
+
+        ids = np.where(is_unit[group], joint_ids[group], joint_ids[group] // 1000 ** exponent % 1000)
+        self.check_id_array(ids)
+
+        if as_ids:
+            return ids, offsets
+
+        return np.array(self.elems, dtype=object)[ids], offsets
+
     def get_nearest_unit(self, unit):
 
         raise NotImplementedError
 
     def get_nearest_phoneme(self, unit):
+        return self.nearest_mapping.get_or_compute(unit, self.compute_nearest_phoneme, self.is_unknown)
 
-        if self.nearest_mapping is None:
-            self.nearest_mapping = dict()
+    def is_unknown(self, unit):
+        # whether unit is neither in this unit nor a valid ipa symbol
+        return unit not in self.unit_to_id and self.ipa.is_unknown(unit)
 
-        if unit in self.nearest_mapping:
-            return self.nearest_mapping[unit]
+    def get_stats(self):
+        """
+        statistics of the nearest phoneme cache, see phonepiece.cache.CacheStats
+
+        :return: dict
+        """
+
+        return {'nearest_phoneme': self.nearest_mapping.stats.to_dict()}
+
+    def compute_nearest_phoneme(self, unit):
 
         if unit in self.unit_to_id:
-            self.nearest_mapping[unit] = unit
             return unit
 
         # special handling for :
         if unit.endswith('ː') and unit[:-1] in self.unit_to_id:
-            self.nearest_mapping[unit] = unit[:-1]
             return unit[:-1]
 
         target_unit = list(self.unit_to_id.keys())[1:-1]
-        nearest_unit = self.ipa.most_similar(unit, target_unit)
-        self.nearest_mapping[unit] = nearest_unit
-
-        return nearest_unit
\ No newline at end of file
+        return self.ipa.most_similar(unit, target_unit)
\ No newline at end of file
@@ -1,26 +1,23 @@
 from phonepiece.config import *
-from phonepiece.bin.download_model import download_model
 from phonepiece.lang import normalize_lang_id
-import pip
 import importlib
 
 def import_with_auto_install(package, package_name):
     try:
         return importlib.import_module(package)
     except ImportError:
+        # pip is slow to import, only load it when the package is missing
+        import pip
         pip.main(['install', package_name])
     return importlib.import_module(package)
 
 
-def load_lang_dir(lang_id, model_name='latest'):
+def lang_dir_name(lang_id):
     """
-    make sure lang_dir is properly downloaded or loaded
+    name of the directory of lang_id in a model
 
     :param lang_id: a 3 char or 2 char iso id
-    :param model_name: model name or a customized path
-    :type lang_id_or_path:
-    :return:
-    :rtype:
+    :return: directory name
     """
 
     # normalize language id (e.g: 2 char 639-1 -> 3 char 639-3)
@@ -31,6 +28,22 @@ def load_lang_dir(lang_id, model_name='latest'):
     if lang_id in ['prn', 'con', 'aux', 'null']:
         lang_id = '_' + lang_id
 
+    return lang_id
+
+
+def load_lang_dir(lang_id, model_name='latest'):
+    """
+    make sure lang_dir is properly downloaded or loaded
+
+    :param lang_id: a 3 char or 2 char iso id
+    :param model_name: model name or a customized path
+    :type lang_id_or_path:
+    :return:
+    :rtype:
+    """
+
+    lang_id = lang_dir_name(lang_id)
+
     # check whether a customized path is used or not
     if (Path(model_name) / lang_id).exists():
         lang_dir = Path(model_name) / lang_id
@@ -39,6 +52,7 @@ def load_lang_dir(lang_id, model_name='latest'):
 
         # if not exists, we try to download the model
         if not lang_dir.exists():
+            from phonepiece.bin.download_model import download_model
             download_model(model_name)
 
         if not lang_dir.exists():
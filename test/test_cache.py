@@ -0,0 +1,103 @@
+import pickle
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from phonepiece.cache import BoundedCache, RemapCache
+from phonepiece.inventory import create_inventory
+from phonepiece.unit import create_unit
+from phonepiece.config import PhonePieceConfig
+
+
+class TestCache(unittest.TestCase):
+
+    def test_remap_cache(self):
+
+        cache = RemapCache(max_size=4)
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def compute(key):
+            calls.append(key)
+            return key.upper()
+
+        def lookup(key):
+            barrier.wait()
+            return cache.get_or_compute(key, compute)
+
+        # concurrent misses of the same key are computed once
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(list(pool.map(lookup, ['a'] * 8)), ['A'] * 8)
+        self.assertEqual(calls, ['a'])
+
+        # the oldest entries are dropped once the cache is full
+        for key in 'bcdefg':
+            cache.get_or_compute(key, compute)
+        self.assertEqual(len(cache), 4)
+        self.assertTrue('g' in cache and 'a' not in cache)
+
+    def test_lru_cache(self):
+
+        max_size = [3]
+        cache = BoundedCache(lambda: max_size[0], lru=True)
+
+        for key in 'abc':
+            cache.get_or_compute(key, str.upper)
+
+        # hits move entries to the end, the least recently used one is dropped
+        self.assertEqual(cache.get_or_compute('a', str.upper), 'A')
+        cache.get_or_compute('d', str.upper)
+        self.assertEqual(list(cache), ['c', 'a', 'd'])
+
+        # the size is read when entries are added
+        max_size[0] = 1
+        cache.get_or_compute('e', str.upper)
+        self.assertEqual(list(cache), ['e'])
+
+    def test_shared_inventory(self):
+
+        inv = create_inventory('abc', ['a', 'b', 'e', 'k', 's'])
+        phonemes = ['aː', 'ɑ', 'p', 'kʰ', 'z', '#', 'i'] * 20
+
+        expected = [inv.compute_nearest_phoneme(phoneme) for phoneme in phonemes]
+
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(list(pool.map(inv.get_nearest_phoneme, phonemes)), expected)
+            self.assertEqual(list(pool.map(inv.phoneme.get_nearest_phoneme, phonemes)), expected)
+
+    def test_cache_stats(self):
+
+        inv = create_inventory('abc', ['a', 'b', 'e', 'k', 's'])
+
+        for phoneme in ['a', 'ɑ', 'ɑ', '#', '#', 'a']:
+            inv.get_nearest_phoneme(phoneme)
+
+        stats = inv.get_stats()['nearest_phoneme']
+        self.assertEqual((stats['hits'], stats['misses'], stats['unknown']), (3, 3, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+        self.assertTrue(stats['miss_time'] > 0.0)
+        self.assertTrue('normalize' in inv.get_stats()['ipa'])
+
+        # summaries are logged periodically when enabled
+        PhonePieceConfig.stats_log_interval = 0
+        try:
+            with self.assertLogs('phonepiece', level='INFO') as logs:
+                inv.get_nearest_phoneme('p')
+            self.assertTrue('abc nearest phoneme: 3 hits, 4 misses' in logs.output[-1])
+        finally:
+            PhonePieceConfig.stats_log_interval = None
+
+    def test_pickle(self):
+
+        inv = create_inventory('abc', ['a', 'b', 'e', 'k', 's'])
+        inv.get_nearest_phoneme('ɑ')
+        inv.phoneme.get_nearest_phoneme('ɑ')
+
+        # caches keep their entries, and get new locks
+        for obj in [inv, inv.phoneme, create_unit(['a', 'b'])]:
+            loaded = pickle.loads(pickle.dumps(obj))
+            self.assertEqual(loaded.nearest_mapping.mapping, obj.nearest_mapping.mapping)
+            self.assertEqual(len(loaded.nearest_mapping.locks), len(obj.nearest_mapping.locks))
+
+        loaded = pickle.loads(pickle.dumps(inv))
+        self.assertEqual(loaded.get_nearest_phoneme('ɑ'), 'a')
+        self.assertEqual(loaded.get_nearest_phone('p'), inv.get_nearest_phone('p'))
@@ -1,5 +1,7 @@
+import io
 import unittest
-from phonepiece.distance import phonological_distance, edit_distance
+from phonepiece.distance import phonological_distance, edit_distance, fuzzy_match, naive_fuzzy_match, fuzzy_match_all, fuzzy_match_multi, edit_distance_table, scalar_edit_distance_table
+from phonepiece.ipa import read_ipa
 
 class TestDistance(unittest.TestCase):
 
@@ -7,4 +9,51 @@ class TestDistance(unittest.TestCase):
 
         self.assertEqual(edit_distance('a', 'a')[0], 0)
         self.assertEqual(edit_distance('a', 'b')[0], 1)
-        self.assertEqual(phonological_distance('a', 'a'), 0)
\ No newline at end of file
+        self.assertEqual(phonological_distance('a', 'a'), 0)
+
+    def test_edit_distance_alignment(self):
+
+        err, add_cnt, del_cnt, sub_cnt, add_lst, del_lst, sub_lst = edit_distance(['k', 'æ', 't'], ['k', 'a', 't', 's'])
+        self.assertEqual(err, 2.0)
+        self.assertEqual((add_cnt, del_cnt, sub_cnt), (1, 0, 1))
+        self.assertEqual((add_lst, del_lst, sub_lst), (['s'], [], [('æ', 'a')]))
+
+        self.assertEqual(edit_distance('abc', '')[:4], (3, 0, 3, 0))
+        self.assertEqual(edit_distance('', 'ab')[:4], (2, 2, 0, 0))
+
+        out = io.StringIO()
+        edit_distance('ab', 'b', utt_id='utt', verbose=True, out=out)
+        self.assertEqual(out.getvalue().splitlines()[1:], ['UTT: utt', 'ERR 1.0: ADD 0, DEL 1, SUB 0',
+                                                          'REF:     a    b', 'HYP:          b', 'OPS:   Del     '])
+
+    def test_edit_distance_table(self):
+
+        # the scalar fill used for short sequences agrees with the numpy fill, including the directions
+        for string_a, string_b in [('abcab', 'bacbb'), ('aaaa', 'aa'), ('', 'ab'), ('ab', '')]:
+            err, path = edit_distance_table(string_a, string_b)
+            scalar_err, scalar_path = scalar_edit_distance_table(string_a, string_b)
+
+            self.assertEqual(err, scalar_err)
+            self.assertEqual([row[1:] for row in path[1:].tolist()], [row[1:] for row in scalar_path[1:]])
+
+    def test_phonological_distance(self):
+
+        ipa = read_ipa()
+
+        self.assertEqual(phonological_distance('a b', 'a p'), ipa.distance('b', 'p'))
+        self.assertEqual(phonological_distance(['k', 'æ', 't'], ['k', 'a', 't', 's']), ipa.distance('æ', 'a') + 1)
+        self.assertEqual(phonological_distance([], ['a', 'b']), 2)
+
+    def test_fuzzy_match(self):
+
+        text = ['s', 'k', 'æ', 't', 'k', 'ʰ', 'æ', 't', 's']
+
+        for pattern in [['k', 'æ', 't'], ['æ', 't', 's'], ['p'], []]:
+            self.assertEqual(fuzzy_match(pattern, text), naive_fuzzy_match(pattern, text))
+
+        self.assertEqual(fuzzy_match('kat', 'xxkatxx'), (0, 2, 4))
+        self.assertEqual(fuzzy_match_all('kat', 'xkatxkxtx', 1), [(1, 1, 2), (0, 1, 3), (1, 1, 4), (1, 5, 7)])
+
+        # a single scan for many patterns gives the same matches
+        patterns = ['kat', 'xt', 'tk']
+        self.assertEqual(fuzzy_match_multi(patterns, 'xkatxkxtx', 1), [fuzzy_match_all(pattern, 'xkatxkxtx', 1) for pattern in patterns])
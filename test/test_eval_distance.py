@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+import multiprocessing
+from pathlib import Path
+from unittest import mock
+from phonepiece.bin.eval_distance import eval_distance, score_utterances, join_utterances, join_sorted, join_indexed, build_ref_index
+
+
+def kill_worker(*args):
+    os._exit(1)
+
+
+class TestEvalDistance(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+        self.ref = self.root / 'ref.txt'
+        self.hyp = self.root / 'hyp.txt'
+
+        self.ref.write_text('utt1 k æ t\nutt2 d ɔ ɡ\nutt3 b ɝ d\nutt4 f ɪ ʃ\nutt5 m a ʊ s\n')
+        self.hyp.write_text('utt1 k a t s\nutt2 d ɔ\nutt3 b ɝ d\nutt4 p ɪ s\nutt5 m a s\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_score_utterances(self):
+
+        utterances = list(join_utterances(self.hyp, self.ref))
+
+        single = list(score_utterances(utterances, jobs=1))
+        multi = list(score_utterances(utterances, jobs=2, chunk_size=2))
+
+        self.assertEqual(single, multi)
+        self.assertEqual([result[-1].splitlines()[1] for result in multi], ['UTT: utt1', 'UTT: utt2', 'UTT: utt3', 'UTT: utt4', 'UTT: utt5'])
+        self.assertIsNone(os.environ.get('PHONEPIECE_IPA_SHM'))
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'workers inherit the patched module only when forked')
+    def test_score_utterances_timeout(self):
+
+        utterances = list(join_utterances(self.hyp, self.ref))
+
+        # a chunk whose worker was killed is reported after the timeout instead of blocking forever
+        with mock.patch('phonepiece.bin.eval_distance.phonological_distance', new=kill_worker):
+            with self.assertRaises(multiprocessing.TimeoutError):
+                list(score_utterances(utterances, jobs=2, chunk_size=2, timeout=2))
+
+        self.assertIsNone(os.environ.get('PHONEPIECE_IPA_SHM'))
+
+    def test_eval_distance_jobs(self):
+
+        single_output = self.root / 'single.txt'
+        multi_output = self.root / 'multi.txt'
+
+        single = eval_distance(self.hyp, self.ref, output=single_output, return_counter=True, jobs=1)
+        multi = eval_distance(self.hyp, self.ref, output=multi_output, return_counter=True, jobs=2, chunk_size=2)
+
+        self.assertEqual(single[:2], multi[:2])
+
+        for single_counter, multi_counter in zip(single[2:], multi[2:]):
+            self.assertEqual(list(single_counter.items()), list(multi_counter.items()))
+
+        self.assertEqual(single_output.read_text(), multi_output.read_text())
+        self.assertIsNone(os.environ.get('PHONEPIECE_IPA_SHM'))
+
+    def test_join(self):
+
+        # sorted files with a hypothesis without reference (utt0) and a duplicated reference (utt2)
+        self.ref.write_text('utt1 k æ t\nutt2 d ɔ ɡ\nutt2 d ɔ ɡ z\nutt3 b ɝ d\n')
+        self.hyp.write_text('utt0 a\nutt1 k a t s\nutt2 d ɔ\nutt3 b ɝ d\n')
+
+        expected = [('utt1', ['k', 'æ', 't'], ['k', 'a', 't', 's']),
+                    ('utt2', ['d', 'ɔ', 'ɡ', 'z'], ['d', 'ɔ']),
+                    ('utt3', ['b', 'ɝ', 'd'], ['b', 'ɝ', 'd'])]
+
+        for join in ['memory', 'sorted', 'index']:
+            self.assertEqual(list(join_utterances(self.hyp, self.ref, join=join)), expected)
+
+        reports = []
+        for join in ['memory', 'sorted', 'index']:
+            output = self.root / f'{join}.txt'
+            eval_distance(self.hyp, self.ref, output=output, join=join)
+            reports.append(output.read_text())
+
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual(reports[0], reports[2])
+
+    def test_join_indexed(self):
+
+        # unsorted files, the index is kept at index_path
+        self.ref.write_text('utt3 b ɝ d\nutt1 k æ t\nutt3 b ɝ\n')
+        self.hyp.write_text('utt3 b ɝ d\nutt2 d ɔ\nutt1 k a t\n')
+
+        index_path = self.root / 'ref.idx'
+        self.assertEqual(list(join_indexed(self.hyp, self.ref, index_path)),
+                         [('utt3', ['b', 'ɝ'], ['b', 'ɝ', 'd']), ('utt1', ['k', 'æ', 't'], ['k', 'a', 't'])])
+        self.assertTrue(index_path.exists())
+
+        build_ref_index(self.ref, index_path)
+        self.assertEqual(list(join_indexed(self.hyp, self.ref, index_path))[0][1], ['b', 'ɝ'])
+
+    def test_join_sorted_unsorted(self):
+
+        self.ref.write_text('utt1 k æ t\nutt2 d ɔ ɡ\n')
+        self.hyp.write_text('utt2 d ɔ\nutt1 k a t\n')
+
+        with self.assertRaises(AssertionError):
+            list(join_sorted(self.hyp, self.ref))
+
+        self.ref.write_text('utt2 d ɔ ɡ\nutt1 k æ t\n')
+        self.hyp.write_text('utt1 k a t\nutt2 d ɔ\n')
+
+        with self.assertRaises(AssertionError):
+            list(join_sorted(self.hyp, self.ref))
@@ -1,5 +1,19 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
-from phonepiece.inventory import read_inventory, create_inventory
+import numpy as np
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import phonepiece.inventory
+from phonepiece.inventory import read_inventory, read_inventories, read_base_projections, load_inventory, create_inventory, write_inventory, evict_inventory, clear_inventory_cache
+import phonepiece.bundle
+from phonepiece.bundle import write_inventory_bundle, read_inventory_bundle
+from phonepiece.config import PhonePieceConfig
+from phonepiece.ipa import read_ipa
 
 
 class TestInventory(unittest.TestCase):
@@ -33,4 +47,164 @@ class TestInventory(unittest.TestCase):
 
         inv = create_inventory('eng', ['a', 'b', 'c'])
         self.assertEqual(len(inv.phoneme), 5)
-        self.assertEqual(len(inv.phone), 5)
\ No newline at end of file
+        self.assertEqual(len(inv.phone), 5)
+
+    def test_inventory_cache(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lang_dir = Path(tmp_dir) / 'abc'
+            write_inventory(create_inventory('abc', ['a', 'b', 'c']), lang_dir)
+
+            # repeated lookups share the same inventory
+            inv = read_inventory(str(lang_dir))
+            self.assertIs(read_inventory(str(lang_dir)), inv)
+            self.assertEqual(read_inventory(str(lang_dir)).lang_id, 'abc')
+
+            # customized inventories are reloaded when their files change
+            write_inventory(create_inventory('abc', ['a', 'b', 'd']), lang_dir)
+            os.utime(lang_dir / 'phoneme.txt', ns=(0, 0))
+
+            new_inv = read_inventory(str(lang_dir))
+            self.assertIsNot(new_inv, inv)
+            self.assertTrue('d' in new_inv.phoneme)
+
+            evict_inventory(str(lang_dir))
+            self.assertIsNot(read_inventory(str(lang_dir)), new_inv)
+
+            # concurrent misses of the same inventory load it once
+            clear_inventory_cache()
+            barrier = threading.Barrier(8)
+
+            def read(_):
+                barrier.wait()
+                return read_inventory(str(lang_dir))
+
+            def slow_load(*args):
+                time.sleep(0.05)
+                return load_inventory(*args)
+
+            with mock.patch.object(phonepiece.inventory, 'load_inventory', side_effect=slow_load) as load:
+                with ThreadPoolExecutor(8) as pool:
+                    inventories = list(pool.map(read, range(8)))
+
+            self.assertEqual(load.call_count, 1)
+            self.assertTrue(all(inventory is inventories[0] for inventory in inventories))
+
+            clear_inventory_cache()
+
+    def test_inventory_bundle(self):
+
+        # the ipa database is read from the real data path
+        read_ipa()
+        data_path = PhonePieceConfig.data_path
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            PhonePieceConfig.data_path = Path(tmp_dir)
+            model_dir = Path(tmp_dir) / 'model' / 'bundle_test'
+
+            try:
+                write_inventory(create_inventory('abc', ['a', 'b', 'c']), model_dir / 'abc')
+                write_inventory(create_inventory('prn', {'a': ['a', 'ɑ'], 'k': ['k']}), model_dir / '_prn')
+
+                # the bundle is built on first use
+                expected = {lang_id: load_inventory(lang_id, 'bundle_test') for lang_id in ['abc', 'prn']}
+                self.assertTrue((model_dir / 'inventory.bundle').exists())
+
+                # languages added to the model rebuild the bundle in the next process
+                write_inventory(create_inventory('xyz', ['a', 'b']), model_dir / 'xyz')
+                phonepiece.bundle._bundles.clear()
+                self.assertTrue('xyz' in read_inventory_bundle('bundle_test'))
+                shutil.rmtree(model_dir / 'xyz')
+
+                # files edited in place are read once the model is packed again
+                write_inventory(create_inventory('abc', ['a', 'b', 'd', 'e']), model_dir / 'abc')
+                self.assertFalse('d' in load_inventory('abc', 'bundle_test').phoneme)
+                write_inventory_bundle('bundle_test')
+                self.assertTrue('d' in load_inventory('abc', 'bundle_test').phoneme)
+                write_inventory(create_inventory('abc', ['a', 'b', 'c']), model_dir / 'abc')
+                write_inventory_bundle('bundle_test')
+
+                # the bundle alone is enough to build inventories
+                for lang_dir in model_dir.iterdir():
+                    if lang_dir.is_dir():
+                        for file in lang_dir.iterdir():
+                            file.unlink()
+
+                inventories = read_inventories(model_name='bundle_test')
+                self.assertEqual(sorted(inventories), ['abc', 'prn'])
+
+                for lang_id, inv in inventories.items():
+                    self.assertEqual(inv.phone.elems, expected[lang_id].phone.elems)
+                    self.assertEqual(inv.phoneme.elems, expected[lang_id].phoneme.elems)
+                    self.assertEqual(dict(inv.phoneme2phone), dict(expected[lang_id].phoneme2phone))
+
+                projections = read_base_projections(model_name='bundle_test')
+                base_inv = read_inventory('prn', 'bundle_test', base=True)
+                self.assertEqual(sorted(set(projections['prn'].values())), sorted(base_inv.phoneme2phone['a'] + base_inv.phoneme2phone['k']))
+
+            finally:
+                PhonePieceConfig.data_path = data_path
+                clear_inventory_cache()
+
+    def test_remap_table(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lang_dir = Path(tmp_dir) / 'abc'
+            write_inventory(create_inventory('abc', ['a', 'b', 'e', 'k', 's']), lang_dir)
+
+            inv = load_inventory(str(lang_dir))
+            table_inv = read_inventory(str(lang_dir), remap_table=True)
+
+            # the table is stored alongside the inventory
+            self.assertTrue((lang_dir / 'remap.npz').exists())
+
+            for phone in ['a', 'aː', 'ɑ', 'p', 'kʰ', 'z', '#']:
+                self.assertEqual(table_inv.get_nearest_phoneme(phone), inv.get_nearest_phoneme(phone))
+                self.assertEqual(table_inv.get_nearest_phone(phone), inv.get_nearest_phone(phone))
+
+            # the stored table is read back
+            inv.load_remap_table()
+            self.assertTrue((inv.phoneme_remap_table == table_inv.phoneme_remap_table).all())
+            self.assertTrue((inv.phone_remap_table == table_inv.phone_remap_table).all())
+
+            clear_inventory_cache()
+
+    def test_remap_batch(self):
+
+        inv = create_inventory('abc', ['a', 'b', 'e', 'k', 's'])
+        sequences = ['kʰæt', ['a', ' ', 'b', 'p'], [], 'sa']
+
+        remapped = [inv.remap(sequence) for sequence in sequences]
+        self.assertEqual(inv.remap_batch(sequences, as_ids=False), remapped)
+
+        ids, offsets = inv.remap_batch(sequences)
+        self.assertEqual(offsets.tolist(), [0, 3, 6, 6, 8])
+        for i, phonemes in enumerate(remapped):
+            self.assertEqual(ids[offsets[i]:offsets[i+1]].tolist(), inv.phoneme.atoi(phonemes))
+
+        matrix, lengths = inv.remap_batch(sequences, padded=True)
+        self.assertEqual(matrix.shape, (4, 3))
+        self.assertEqual(matrix[2].tolist(), [-1, -1, -1])
+        self.assertEqual(lengths.tolist(), [3, 3, 0, 2])
+
+        phone_ids, _ = inv.remap_batch(sequences, broad=False)
+        self.assertEqual(phone_ids[:3].tolist(), inv.phone.atoi(inv.remap('kʰæt', broad=False)))
+
+    def test_project_posterior(self):
+
+        inv = create_inventory('abc', {'a': ['a', 'ɑ'], 'b': ['b', 'p'], 'k': ['k']})
+        projection = inv.get_projection()
+        self.assertEqual(projection.shape, (len(inv.phone), len(inv.phoneme)))
+        self.assertEqual(projection[inv.phone.get_id('ɑ'), inv.phoneme.get_id('a')], 1.0)
+
+        posteriors = np.random.rand(2, 7, len(inv.phone)).astype(np.float32)
+        summed = inv.project_posterior(posteriors)
+        maxed = inv.project_posterior(posteriors, reduction='max')
+
+        for phoneme, phones in inv.phoneme2phone.items():
+            phoneme_id = inv.phoneme.get_id(phoneme)
+            phone_ids = [inv.phone.get_id(phone) for phone in phones]
+            self.assertTrue(np.allclose(summed[..., phoneme_id], posteriors[..., phone_ids].sum(-1)))
+            self.assertTrue(np.allclose(maxed[..., phoneme_id], posteriors[..., phone_ids].max(-1)))
+
+        self.assertEqual(inv.project_posterior(summed, 'phoneme2phone').shape, posteriors.shape)
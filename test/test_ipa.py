@@ -1,5 +1,13 @@
+import os
+import tempfile
 import unittest
-from phonepiece.ipa import read_ipa
+import unicodedata
+import numpy as np
+from pathlib import Path
+from unittest import mock
+import phonepiece.ipa
+from phonepiece.config import PhonePieceConfig, find_cache_path
+from phonepiece.ipa import read_ipa, pack_ipa, unpack_ipa, share_ipa, attach_ipa, unshare_ipa, SymbolIndex, build_ipa, IPA
 
 
 class TestIPA(unittest.TestCase):
@@ -38,3 +46,185 @@ class TestIPA(unittest.TestCase):
         self.assertEqual(ipa.compute_base_phone('a'), 'a')
         self.assertEqual(ipa.compute_base_phone('tː'), 't')
 
+    def test_most_similar(self):
+        ipa = read_ipa()
+
+        # feature matrix is aligned with the symbol index
+        self.assertEqual(ipa.feature_matrix.shape, (len(ipa.phones), 24))
+        self.assertTrue((ipa.feature_matrix[ipa.phone2idx['a']] == ipa['a']).all())
+
+        # features are writable int64 arrays, independent of the shared matrix
+        feature = ipa['a']
+        self.assertEqual(feature.dtype, np.int64)
+        feature *= 200
+        self.assertTrue((ipa.read_feature('a') * 200 == feature).all())
+        self.assertEqual(ipa.phone2feature['a'].dtype, np.int64)
+
+        # invalid candidates are skipped, first candidate is the fallback
+        self.assertEqual(ipa.most_similar('a', ['#', 'b', 'e']), 'e')
+        self.assertEqual(ipa.most_similar('#', ['b', 'e']), 'b')
+        self.assertEqual(ipa.most_similar('a', ['#']), '#')
+
+        # ties are resolved by the candidate order
+        self.assertEqual(ipa.most_similar('a', ['e', 'e']), 'e')
+        self.assertEqual(ipa.compute_base_phone('pʰ'), ipa.most_similar('pʰ', ipa.base_phones))
+
+        # candidate lists are kept in a bounded lru cache
+        cache_size = ipa.candidate_index.max_size
+        ipa.candidate_index.max_size = 2
+        for cands in [['a', 'b'], ['a', 'e'], ['b', 'e'], ['a', 'b']]:
+            ipa.most_similar('i', cands)
+        self.assertEqual(list(ipa.candidate_index), [('b', 'e'), ('a', 'b')])
+        ipa.candidate_index.max_size = cache_size
+
+    def test_normalize_cache(self):
+        ipa = read_ipa()
+
+        # rules feeding into each other are still applied in order
+        self.assertEqual(ipa.normalize('tˈʃ'), ipa.normalize('t͡ʃ'))
+        self.assertEqual(ipa.normalize('g̥'), 'k')
+
+        # failures are reported on every call even when cached
+        with self.assertLogs('phonepiece', level='ERROR') as logs:
+            ipa.normalize('#')
+            ipa.normalize('#')
+        self.assertEqual(len(logs.output), 2)
+
+        cache_size = ipa.normalize_cache.max_size
+        ipa.normalize_cache.max_size = 2
+        for phone in ['a', 'b', 'c', 'd', 'kʷ', 'pʰ']:
+            ipa.normalize(phone)
+        self.assertTrue(len(ipa.normalize_cache) <= 2)
+        ipa.normalize_cache.max_size = cache_size
+
+    def test_tokenize_batch(self):
+        ipa = read_ipa()
+
+        lines = ['kʰæt', 'a  a', 'kʰæt', '', 'ʔɓaːn˧˧']
+        self.assertEqual(ipa.tokenize_batch(lines), [ipa.tokenize(line) for line in lines])
+        self.assertEqual(ipa.tokenize_batch([]), [])
+
+    def test_ipa_db(self):
+        ipa = read_ipa()
+
+        # a compiled database round trips into the same IPA
+        loaded = unpack_ipa(pack_ipa(ipa, 'test'), 'test')
+        self.assertEqual(list(loaded.phones), list(ipa.phones))
+        self.assertEqual(loaded.base_phones, ipa.base_phones)
+        self.assertEqual(loaded.canonical_phone, ipa.canonical_phone)
+        self.assertTrue((loaded.feature_matrix == ipa.feature_matrix).all())
+        self.assertTrue((loaded.base_index == ipa.get_base_index()).all())
+
+        # outdated databases are rejected
+        self.assertIsNone(unpack_ipa(pack_ipa(ipa, 'test'), 'other'))
+
+    def test_cache_path(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_dir = Path(tmp_dir)
+            blocker = tmp_dir / 'file'
+            blocker.write_text('')
+
+            # $PHONEPIECE_CACHE first, then $XDG_CACHE_HOME/phonepiece if it cannot be created
+            with mock.patch.dict(os.environ, {'PHONEPIECE_CACHE': str(tmp_dir / 'env'), 'XDG_CACHE_HOME': str(tmp_dir / 'xdg')}):
+                self.assertEqual(find_cache_path(), tmp_dir / 'env')
+
+            with mock.patch.dict(os.environ, {'PHONEPIECE_CACHE': str(blocker / 'env'), 'XDG_CACHE_HOME': str(tmp_dir / 'xdg')}):
+                self.assertEqual(find_cache_path(), tmp_dir / 'xdg' / 'phonepiece')
+
+            # read_ipa compiles the database into the cache directory
+            cached_ipa = read_ipa()
+            try:
+                PhonePieceConfig.cache_path = tmp_dir / 'cache'
+                phonepiece.ipa.ipa = None
+
+                ipa = read_ipa()
+                self.assertTrue((tmp_dir / 'cache' / 'ipa.db').exists())
+                self.assertEqual(list(ipa.phones), list(cached_ipa.phones))
+            finally:
+                PhonePieceConfig.cache_path = None
+                phonepiece.ipa.ipa = cached_ipa
+
+    def test_canonical_form(self):
+        ipa = build_ipa()
+
+        # base phones are preferred over shorter or earlier symbols with the same features
+        # symbols are NFD normalized
+        affricate = unicodedata.normalize('NFD', 'c͡ç')
+        self.assertTrue(affricate in ipa.base_phones_set)
+        self.assertEqual(ipa.canonical_phone['t͡ɕ'], affricate)
+        self.assertEqual(ipa.canonical_phone['t͡ʃʲ'], affricate)
+        self.assertEqual(ipa.canonical_phone['t̪͡θ'], 't̪͡s̪')
+
+        # otherwise the shortest symbol of the group
+        self.assertFalse('pː' in ipa.base_phones_set)
+        self.assertEqual(ipa.canonical_phone['p͡tː'], 'pː')
+        self.assertEqual(ipa.canonical_phone['d̠'], 'd')
+
+        # the canonical map round trips through the database, and through IPA with or without canonical_index
+        loaded = unpack_ipa(pack_ipa(ipa, 'test'), 'test')
+        rebuilt = IPA(ipa.phones, ipa.feature_matrix, ipa.weights, ipa.base_phones)
+        given = IPA(ipa.phones, ipa.feature_matrix, ipa.weights, ipa.base_phones, canonical_index=ipa.canonical_index)
+
+        for other in [loaded, rebuilt, given]:
+            self.assertEqual(dict(other.canonical_phone), ipa.canonical_phone)
+            self.assertTrue((other.canonical_index == ipa.canonical_index).all())
+
+    def test_base_index(self):
+        ipa = read_ipa()
+
+        # the precomputed projection agrees with scanning the base phones
+        phones = ['a', 'tː', 'pʰ', 'kʷʰ', 'ɑ̃', 'ʰkʷ', 'x', '#']
+        base_phones = [ipa.most_similar(phone, ipa.base_phones) for phone in phones]
+
+        self.assertEqual([ipa.compute_base_phone(phone) for phone in phones], base_phones)
+        self.assertEqual(ipa.compute_base_phones(phones), base_phones)
+
+    def test_nearest_phones(self):
+        ipa = read_ipa()
+
+        nearest = ipa.nearest_phones('a', 3, ['b', 'e', 'ɑ', 'i', 'a'])
+        self.assertEqual([phone for phone, _ in nearest], ['a', 'e', 'ɑ'])
+        self.assertEqual(nearest[1][1], ipa.distance('a', 'e'))
+
+        # the top candidate agrees with most_similar
+        cands = ['p', 's', 'a', 'e']
+        self.assertEqual(ipa.nearest_phones('b', 1, cands)[0][0], ipa.most_similar('b', cands))
+
+        # search over all symbols
+        self.assertEqual(ipa.nearest_phones('a', 1)[0][1], 0.0)
+        self.assertEqual(len(ipa.nearest_phones_batch(['a', 'b', '#'], 4)[1]), 4)
+        self.assertEqual(ipa.nearest_phones('#'), [])
+
+    def test_distance_matrix(self):
+        ipa = read_ipa()
+
+        phones_a = ['a', 'b', '#', 'a']
+        phones_b = ['e', 'ɑ', 'p']
+
+        distances = ipa.distance_matrix(phones_a, phones_b)
+        self.assertEqual(distances.shape, (4, 3))
+
+        for i, p1 in enumerate(phones_a):
+            for j, p2 in enumerate(phones_b):
+                self.assertEqual(distances[i, j], ipa.distance(p1, p2))
+
+    def test_share_ipa(self):
+        ipa = read_ipa()
+
+        name = share_ipa()
+        try:
+            shared = attach_ipa(name)
+            self.assertEqual(shared.phones, ipa.phones)
+            self.assertEqual(shared.most_similar('a', ['b', 's', 'r', 'e']), 'e')
+
+            # symbols are looked up in the shared table, without a dict per process
+            self.assertIsInstance(shared.phone2idx, SymbolIndex)
+            for phone in ['a', 'kʰ', 'ɑ̃', ipa.phones[-1]]:
+                self.assertEqual(shared.phone2idx[phone], ipa.phone2idx[phone])
+                self.assertEqual(shared.canonical_phone[phone], ipa.canonical_phone[phone])
+            self.assertFalse('#' in shared.phone2idx)
+        finally:
+            unshare_ipa()
+
+        self.assertEqual(read_ipa().normalize('a:'), 'aː')
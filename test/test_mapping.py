@@ -0,0 +1,32 @@
+import unittest
+from phonepiece.inventory import create_inventory
+from phonepiece.mapping import read_inventory_mapping, read_inventory_mappings, clear_mapping_cache
+
+
+class TestMapping(unittest.TestCase):
+
+    def test_inventory_mapping(self):
+
+        inv_a = create_inventory('aaa', ['a', 'aː', 'b', 'kʰ', 'ʃ'])
+        inv_b = create_inventory('bbb', ['ɑ', 'a', 'p', 'k', 's', 'e'])
+
+        mapping = read_inventory_mapping(inv_a, inv_b)
+        self.assertEqual(mapping.similarity.shape, (5, 6))
+
+        # mappings agree with get_nearest_phoneme in both directions
+        phonemes_a = inv_a.phoneme.elems[1:-1]
+        phonemes_b = inv_b.phoneme.elems[1:-1]
+        self.assertEqual(mapping.map_a2b(phonemes_a), [inv_b.get_nearest_phoneme(phoneme) for phoneme in phonemes_a])
+        self.assertEqual(mapping.map_b2a(phonemes_b), [inv_a.get_nearest_phoneme(phoneme) for phoneme in phonemes_b])
+
+        # id mappings keep <blk> and <eos>
+        ids = inv_a.phoneme.atoi(['<blk>', 'b', '<eos>'])
+        self.assertEqual(inv_b.phoneme.itoa(mapping.a2b[ids].tolist()), ['<blk>', 'p', '<eos>'])
+
+        # inventories with the same content share the mapping
+        self.assertIs(read_inventory_mapping(create_inventory('aaa', ['a', 'aː', 'b', 'kʰ', 'ʃ']), inv_b), mapping)
+
+        mappings = read_inventory_mappings({'bbb': inv_b, 'aaa': inv_a})
+        self.assertIs(mappings[('aaa', 'bbb')], mapping)
+
+        clear_mapping_cache()
@@ -0,0 +1,15 @@
+import sys
+import unittest
+import subprocess
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_lazy_import(self):
+
+        # heavy dependencies should not be loaded by importing the inventory module
+        script = "import sys; from phonepiece.inventory import read_inventory; print(' '.join(sorted(sys.modules)))"
+        modules = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout.split()
+
+        for module in ['numpy', 'iso639', 'urllib.request', 'tarfile', 'pip', 'editdistance']:
+            self.assertNotIn(module, modules)
@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+from phonepiece.unit import create_unit
+
+
+class TestUnit(unittest.TestCase):
+
+    def test_array(self):
+
+        unit = create_unit(['a', 'b', 'c'])
+
+        ids = np.array([[1, 2], [3, 0]])
+        self.assertEqual(unit.itoa(ids).tolist(), [['a', 'b'], ['c', '<blk>']])
+        self.assertEqual(unit.atoi(np.array(['a', 'c'])).tolist(), [1, 3])
+        self.assertEqual(unit.atoi(['a', 'c']), [1, 3])
+        self.assertEqual(unit.itoa([1, 3]), ['a', 'c'])
+
+        # offending ids and units are reported together
+        with self.assertRaisesRegex(AssertionError, r'\[-1, 9\]'):
+            unit.itoa(np.array([1, 9, -1]))
+
+        with self.assertRaisesRegex(AssertionError, 'x'):
+            unit.atoi(['a', 'x'])
+
+    def test_joint(self):
+
+        unit = create_unit(['a', 'b', 'c'])
+
+        joint_ids = unit.pack_joint([1, 2, 3, 2, 1, 3], [0, 2, 3, 6])
+        self.assertEqual(joint_ids.tolist(), [unit.get_joint_id('a:b'), unit.get_joint_id('c'), unit.get_joint_id('b:a:c')])
+
+        units, offsets = unit.unpack_joint(joint_ids)
+        self.assertEqual(offsets.tolist(), [0, 2, 3, 6])
+        self.assertEqual(units.tolist(), unit.get_joint_units(joint_ids.tolist()))
+
+        ids, _ = unit.unpack_joint(joint_ids, as_ids=True)
+        self.assertEqual(ids.tolist(), [1, 2, 3, 2, 1, 3])
+
+        # int64 cannot hold more than 6 units
+        with self.assertRaises(OverflowError):
+            unit.pack_joint([1] * 7, [0, 7])
+
+    def test_joint_large(self):
+
+        unit = create_unit([f'u{i}' for i in range(1200)])
+
+        # a single unit keeps its own id even if it does not fit into 3 digits, as in get_joint_id
+        joint_ids = unit.pack_joint([1100, 3, 5, 999], [0, 1, 3, 4])
+        elems = [unit.id_to_unit[i] for i in [1100, 3, 5, 999]]
+        self.assertEqual(joint_ids.tolist(), [unit.get_joint_id(elems[0]), unit.get_joint_id(elems[1] + ':' + elems[2]), unit.get_joint_id(elems[3])])
+
+        ids, offsets = unit.unpack_joint(joint_ids, as_ids=True)
+        self.assertEqual(ids.tolist(), [1100, 3, 5, 999])
+        self.assertEqual(offsets.tolist(), [0, 1, 3, 4])
+
+        # combined groups cannot hold ids of more than 3 digits
+        with self.assertRaisesRegex(OverflowError, r'\[1100\]'):
+            unit.pack_joint([1100, 3], [0, 2])